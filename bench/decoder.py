@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Alexandru Catrina
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Micro-benchmark of the replay decoding path: nvs line to rendered setter.
+
+    developer   - Schema.developer, Schema subclass and Template substitution
+    compiled    - Schema.parse and compiled Record with preparsed templates
+
+Usage: python bench/decoder.py [events]
+"""
+
+from __future__ import print_function
+
+from os import path
+from sys import argv, path as sys_path
+from random import randint, seed
+from time import time
+from json import load
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys_path.insert(0, path.join(ROOT, "src"))
+
+from core.events import Events
+from core.schema import Schema
+
+
+def sample(count):
+    seed(count)
+    timestamp, lines = 0, []
+    for _ in range(count):
+        timestamp += randint(0, 40)
+        x, y = randint(0, 1366), randint(0, 768)
+        kind = randint(0, 19)
+        if kind < 17:
+            lines.append("mousemove,{},0,{},{},0,0,0,0,".format(timestamp, x, y))
+        elif kind < 19:
+            lines.append("scroll,{},,,,,,,,{}".format(timestamp, y))
+        else:
+            lines.append("click,{},1,{},{},0,0,0,0,div#main>a".format(timestamp, x, y))
+    return lines
+
+
+def developer(events, lines):
+    for line in lines:
+        schema = Schema.developer(line)
+        event = events.get(schema.pop("event"))(schema)
+        event._setter
+
+
+def compiled(events, lines):
+    for line in lines:
+        values = Schema.parse(line)
+        event = events.get(values[0])(values)
+        event._setter
+
+
+def measure(name, func, events, lines):
+    start = time()
+    func(events, lines)
+    elapsed = time() - start
+    rate = len(lines) / elapsed
+    print("{:<12} {:>10.0f} events/sec ({:.3f}s)".format(name, rate, elapsed))
+    return rate
+
+
+if __name__ == "__main__":
+    count = int(argv[1]) if len(argv) > 1 else 200000
+    with open(path.join(ROOT, "res", "data", "events.json")) as data:
+        classes = dict(Events.builder(Schema, load(data)))
+    lines = sample(count)
+    print("Decoding {} events...".format(count))
+    before = measure("developer", developer, classes, lines)
+    after = measure("compiled", compiled,
+                    {k: v.compile() for k, v in classes.items()}, lines)
+    print("Speedup {:.2f}x".format(after / before))
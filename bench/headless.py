@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Alexandru Catrina
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark of browser startup time and memory for both headless modes.
+
+    xvfb        - real browser inside an X virtual framebuffer
+    native      - browser native headless mode, no X server
+
+Startup includes the Xvfb launch in xvfb mode. RSS is summed over every
+process started for the run (Xvfb, driver and browser processes).
+
+Usage: python bench/headless.py [browser] [runs]
+"""
+
+from __future__ import print_function
+
+from os import path, listdir, getpid
+from sys import argv, path as sys_path
+from time import time
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys_path.insert(0, path.join(ROOT, "src"))
+
+from core.app import Application
+from util.capabilities import Capabilities
+from util.webbrowser import WebBrowser
+
+WIDTH, HEIGHT = 1366, 768
+
+
+def children(parent):
+    tree, found = {}, set()
+    for pid in listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open("/proc/{}/stat".format(pid)) as stat:
+                ppid = int(stat.read().rsplit(")", 1)[1].split()[1])
+        except (IOError, IndexError, ValueError):
+            continue
+        tree.setdefault(ppid, []).append(int(pid))
+    pending = [parent]
+    while pending:
+        for pid in tree.get(pending.pop(), []):
+            found.add(pid)
+            pending.append(pid)
+    return found
+
+
+def rss(pids):
+    total = 0
+    for pid in pids:
+        try:
+            with open("/proc/{}/status".format(pid)) as status:
+                for line in status:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+        except IOError:
+            continue
+    return total / 1024.
+
+
+def launch(browser, native):
+    Capabilities.set_headless(native)
+    screen = Application.Display.SystemScreen if native \
+        else Application.Display.VirtualScreen
+    # NOTE: the virtual display starts inside the timed region
+    started = time()
+    with screen(width=WIDTH, height=HEIGHT):
+        session = WebBrowser(browser, WIDTH, HEIGHT)
+        session.open_page("about:blank")
+        elapsed = time() - started
+        memory = rss(children(getpid()))
+        session.close_browser()
+    return elapsed, memory
+
+
+def measure(name, browser, native, runs):
+    samples = [launch(browser, native) for _ in range(runs)]
+    startup = sum(s[0] for s in samples) / len(samples)
+    memory = sum(s[1] for s in samples) / len(samples)
+    print("{:<8} startup {:>6.2f}s  rss {:>8.1f} MB".format(name, startup, memory))
+    return startup, memory
+
+
+if __name__ == "__main__":
+    browser = argv[1] if len(argv) > 1 else "firefox"
+    runs = int(argv[2]) if len(argv) > 2 else 3
+    WebBrowser.set_logger(lambda message: None)
+    print("Launching {} {} times per mode...".format(browser, runs))
+    xvfb = measure("xvfb", browser, False, runs)
+    native = measure("native", browser, True, runs)
+    print("Native saves {:.2f}s and {:.1f} MB per browser".format(
+        xvfb[0] - native[0], xvfb[1] - native[1]))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Alexandru Catrina
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+CLI startup budget per mode.
+
+Runs quick nova commands on a small sample scenario and reports the median
+wall time against the budget of each mode, plus the heavy dependencies the
+mode imported. Exits with 1 when a mode goes over budget.
+
+Usage: python bench/startup.py [runs]
+"""
+
+from __future__ import print_function
+
+from os import path, devnull
+from sys import argv, executable
+from time import time
+from shutil import rmtree
+from tempfile import mkdtemp
+from subprocess import Popen, PIPE
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+NOVA = path.join(ROOT, "src")
+HEAVY = ("selenium", "tornado", "xvfbwrapper", "sqlite3")
+
+# (mode, arguments, budget in seconds)
+MODES = (
+    ("help", ["--help"], .15),
+    ("analyze", ["-S", "-a", "{sample}"], .15),
+    ("convert", ["-S", "-c", "{sample}", "--output", "{tmp}/sample.nvsb"], .25),
+    ("optimize", ["-S", "-o", "{sample}", "--output", "{tmp}/sample.opt.nvs"], .25),
+)
+
+
+def sample(tmp, count=1000):
+    filename = path.join(tmp, "sample.nvs")
+    with open(filename, "w") as nvs:
+        nvs.write("about:blank\n1500000000000\nMozilla/5.0 Gecko/20100101 Firefox/55.0\n")
+        nvs.write("1366,768,1920,1080,24,24,1\n")
+        for i in range(count):
+            nvs.write("mousemove,{},0,{},{},0,0,0,0,\n".format(i * 16, i % 1366, i % 768))
+    return filename
+
+
+def run(args):
+    started = time()
+    proc = Popen([executable, "-v", NOVA] + args, stdout=open(devnull, "w"), stderr=PIPE)
+    _, verbose = proc.communicate()
+    elapsed = time() - started
+    imported = set(m for m in HEAVY if "import {} ".format(m) in verbose
+                   or "import {}\n".format(m) in verbose)
+    return elapsed, imported
+
+
+def measure(runs, tmp):
+    over, fields = 0, {"sample": sample(tmp), "tmp": tmp}
+    for name, args, budget in MODES:
+        args = [a.format(**fields) for a in args]
+        samples = [run(args) for _ in range(runs)]
+        median = sorted(s[0] for s in samples)[len(samples) // 2]
+        heavy = set.union(*(s[1] for s in samples))
+        status = "ok" if median <= budget else "OVER"
+        over += status != "ok"
+        print("{:<10} {:>7.1f} ms  budget {:>5.0f} ms  {:<4}  heavy: {}".format(
+            name, median * 1000, budget * 1000, status, ", ".join(sorted(heavy)) or "-"))
+    return over
+
+
+if __name__ == "__main__":
+    runs = int(argv[1]) if len(argv) > 1 else 5
+    tmp = mkdtemp(prefix="nova-startup-")
+    try:
+        over = measure(runs, tmp)
+    finally:
+        rmtree(tmp)
+    raise SystemExit(1 if over else 0)
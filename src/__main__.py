@@ -14,16 +14,31 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from importlib import import_module
+
 from util.log import Log
 from util.shell import Shell
 from util.updater import bootstrap, Updater
-from util.analyze_mode import analyze_mode
-from util.friend_mode import friend_mode
-from util.update_mode import update_mode
-from util.learn_mode import learn_mode
-from util.work_mode import work_mode
-from util.scan_mode import scan_mode
-from util.interactive_mode import interactive_mode
+
+# NOTE: mode modules are imported only once chosen, so heavy dependencies
+# (selenium, tornado, xvfbwrapper) are loaded by the modes that need them
+MODES = (
+    # (shell option, mode module, update resources first)
+    ("update_system", "update_mode", False),    # update database
+    ("learn", "learn_mode", True),              # generate nvs in learning mode
+    ("task", "work_mode", True),                # run nvs in working mode
+    ("batch", "batch_mode", True),              # run many nvs files concurrently
+    ("daemon", "daemon_mode", True),            # keep nova resident and serve jobs
+    ("scan_system", "scan_mode", True),         # scan system
+    ("analyze_file", "analyze_mode", True),     # analyze nvs file for current system
+    ("convert_file", "convert_mode", False),    # convert nvs between text and binary
+    ("optimize_file", "optimize_mode", False),  # thin redundant events out of nvs
+    ("interactive", "interactive_mode", True),  # launch interactive mode
+)
+
+
+def load_mode(name):
+    return getattr(import_module("util.{}".format(name)), name)
 
 
 if __name__ == "__main__":
@@ -35,38 +50,19 @@ if __name__ == "__main__":
     # initialize logging system
     log = Log(level=shell.verbose, filename=shell.logfile)
 
-    # update application resources
-    if any((shell.learn,
-            shell.task,
-            shell.scan_system,
-            shell.analyze_file,
-            shell.interactive)):
-        Updater.run(log)
-
-    # update mode
-    if shell.update_system:
-        update_mode(log, shell)
-
-    # launch generate mode
-    elif shell.learn:
-        learn_mode(log, shell)
-
-    # launch working mode
-    elif shell.task:
-        work_mode(log, shell)
-
-    # scan system
-    elif shell.scan_system:
-        scan_mode(log, shell)
-
-    # analyze nvs file for current system state and database
-    elif shell.analyze_file:
-        analyze_mode(log, shell)
+    # submit job to a running daemon
+    if shell.connect:
+        load_mode("client_mode")(log, shell)
+        raise SystemExit
 
-    # launch interactive mode
-    elif shell.interactive:
-        interactive_mode(log, shell)
+    for option, name, resources in MODES:
+        if getattr(shell, option):
+            # update application resources
+            if resources:
+                Updater.run(log)
+            load_mode(name)(log, shell)
+            break
 
     # print nova welcome message
     else:
-        friend_mode() and parser.print_help()
+        load_mode("friend_mode")() and parser.print_help()
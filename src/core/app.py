@@ -16,8 +16,6 @@
 Application class object
 """
 
-from xvfbwrapper import Xvfb
-
 
 class Application(object):
 
@@ -39,7 +37,11 @@ class Application(object):
 
         PARAMS = ("width", "height", "colordepth")
 
-        VirtualScreen = Xvfb
+        class VirtualScreen(object):
+
+            def __new__(cls, *args, **kwargs):
+                from xvfbwrapper import Xvfb
+                return Xvfb(*args, **kwargs)
 
         class SystemScreen(object):
 
@@ -18,10 +18,7 @@ Create a browser instance to execute script commands.
 
 from __future__ import print_function
 
-from time import sleep
-
-from selenium import webdriver
-from selenium.common.exceptions import NoSuchWindowException, WebDriverException
+from core.clock import Clock
 
 
 class Browser(object):
@@ -30,9 +27,17 @@ class Browser(object):
     SAVE_PATH = r"/tmp/nova/saved"
     MAX_WIDTH = 8192
     MAX_HEIGHT = 4320
+    LATENESS_TOLERANCE = .005
+    BLANK_PAGE = "about:blank"
+    CLEAR_STORAGE = "window.localStorage.clear();window.sessionStorage.clear();"
+    STATE = ("calltime", "clock", "recorded", "virtual", "late_events",
+             "lateness", "max_lateness", "waited", "loaded", "url")
 
     log = lambda self, message: print(message)
-    calltime = 0
+    calltime, clock = 0, None
+    speed, max_idle, asap = 1., None, False
+    recorded, virtual = 0, 0
+    late_events, lateness, max_lateness, waited = 0, 0, 0, 0
     loaded, closed = False, False
     url, browser, width, height, params = None, None, 0, 0, None
     driver = None
@@ -53,6 +58,7 @@ class Browser(object):
         self.height = height
 
     def init_browser(self, browser):
+        from selenium import webdriver
         if not isinstance(browser, (str, unicode)):
             raise ValueError(u"Unexpected {} datatype".format(type(browser)))
         self.driver = browser.capitalize()
@@ -98,19 +104,86 @@ class Browser(object):
         self.closed = True
         return self
 
-    def action(self, name, event, timestamp):
+    def reset(self):
+        from selenium.common.exceptions import WebDriverException
+        handles = self.browser.window_handles
+        for handle in handles[1:]:
+            self.browser.switch_to.window(handle)
+            self.browser.close()
+        self.browser.switch_to.window(handles[0])
+        try:
+            self.browser.execute_script(self.CLEAR_STORAGE)
+        except WebDriverException:
+            pass
+        self.browser.delete_all_cookies()
+        self.browser.get(self.BLANK_PAGE)
+        self.reset_state()
+        return self
+
+    def reset_state(self):
+        for name in self.STATE:
+            self.__dict__.pop(name, None)
+        return self
+
+    def action(self, name, event, timestamp, *args):
         timestamp = timestamp / 1000.
-        if timestamp > 0:
-            wait_time = timestamp - self.calltime
-            sleep(wait_time) if wait_time > 0 else None
-        else:
+        if timestamp < 0:
             timestamp = 0
+        lateness = self.schedule(timestamp)
         self.before_action(name, event, timestamp)
-        action = self.browser.execute_script(event)
-        self.after_action(name, event, timestamp)
+        action = self.execute(event, *args)
+        self.after_action(name, event, timestamp, lateness)
         self.calltime = timestamp
         return action
 
+    def execute(self, script, *args):
+        return self.browser.execute_script(script, *args)
+
+    @classmethod
+    def set_pace(cls, speed=None, max_idle=None):
+        if speed is not None and str(speed).lower() == "max":
+            cls.asap, cls.speed = True, 1.
+        elif speed is not None:
+            cls.asap, cls.speed = False, float(speed)
+            if cls.speed <= 0:
+                raise ValueError("Unexpected speed: must be greater than zero")
+        if max_idle is not None:
+            cls.max_idle = float(max_idle)
+            if cls.max_idle < 0:
+                raise ValueError("Unexpected idle time: must be positive")
+        return cls
+
+    def timeline(self, timestamp):
+        gap = timestamp - self.recorded
+        if self.max_idle is not None and gap > self.max_idle:
+            gap = self.max_idle
+        self.recorded = timestamp
+        self.virtual += gap / self.speed
+        return self.virtual
+
+    def deadline(self, timestamp):
+        if self.asap:
+            return None
+        if self.clock is None:
+            self.clock = Clock(origin=self.calltime)
+            self.recorded = self.virtual = self.calltime
+        return self.timeline(timestamp)
+
+    def schedule(self, timestamp):
+        return self.wait(self.deadline(timestamp))
+
+    def wait(self, deadline):
+        if deadline is None:
+            return 0
+        started = self.clock.now()
+        lateness = self.clock.wait(deadline)
+        self.waited += self.clock.now() - started
+        if lateness > self.LATENESS_TOLERANCE:
+            self.late_events += 1
+            self.lateness += lateness
+            self.max_lateness = max(self.max_lateness, lateness)
+        return lateness
+
     def before_action(self, *args):
         pass
 
@@ -130,6 +203,7 @@ class Browser(object):
         pass
 
     def ping(self):
+        from selenium.common.exceptions import NoSuchWindowException, WebDriverException
         try:
             return self.browser.current_url
         except NoSuchWindowException:
@@ -0,0 +1,65 @@
+# Copyright 2017 Alexandru Catrina
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Monotonic scenario clock.
+
+Deadlines are absolute offsets (sec) from scenario start, so time spent
+running events never accumulates into drift. Falls back to wall time when
+the system has no monotonic clock available.
+"""
+
+from time import time, sleep
+from ctypes import CDLL, Structure, c_long, byref
+from ctypes.util import find_library
+
+
+class Timespec(Structure):
+
+    _fields_ = [("tv_sec", c_long), ("tv_nsec", c_long)]
+
+
+def system_clock(clock_id=1):
+    try:
+        librt = CDLL(find_library("rt") or find_library("c"), use_errno=True)
+        clock_gettime = librt.clock_gettime
+    except (OSError, AttributeError, TypeError):
+        return time
+    def monotonic():
+        ts = Timespec()
+        if clock_gettime(clock_id, byref(ts)) != 0:
+            return time()
+        return ts.tv_sec + ts.tv_nsec * 1e-9
+    return monotonic
+
+
+monotonic = system_clock()
+
+
+class Clock(object):
+
+    origin, started = 0, None
+
+    def __init__(self, origin=0):
+        self.origin = origin
+        self.started = monotonic()
+
+    def now(self):
+        return monotonic() - self.started + self.origin
+
+    def wait(self, deadline):
+        remaining = deadline - self.now()
+        if remaining > 0:
+            sleep(remaining)
+        return max(self.now() - deadline, 0)
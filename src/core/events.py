@@ -35,6 +35,16 @@ class Events(object):
         }
     }
 
+    METADATA = {}
+
+    @classmethod
+    def metadata(cls, schema, events=None):
+        return {k:v.metadata() for k, v in cls.builder(schema, events)}
+
+    @classmethod
+    def compiled(cls, schema):
+        return {k:v.compile(cls.METADATA.get(k)) for k, v in cls.builder(schema)}
+
     @classmethod
     def builder(cls, schema, events=None):
         if events is None:
@@ -17,8 +17,13 @@ JavaScript scripts and helper methods to generate sample Nova scripts.
 """
 
 from time import time
-from re import sub
-from os import path, makedirs
+from re import search
+from os import path, makedirs, rename, remove, getpid
+from json import dumps
+from hashlib import sha1
+from string import Template
+
+from core.minifier import Minifier
 
 
 HEAD = r"""ws.onopen = function(){{
@@ -61,32 +66,84 @@ setTimeout(function(){{clearInterval(loop);n.remove();}},ttl);
 }},ttl,notification);
 }}('{color}','Nova is {status}',{ttl}));"""
 
+INJECTION = r"""!(function(ws,w,s,c){{
+{library}{script}
+}}(new WebSocket('wss://localhost:8436'),window,screen,','));"""
+
 INJECT_CONNECTION = r"""var script = document.createElement('script');
 script.type = 'text/javascript';
 script.id = 'nova{uuid}';
-script.innerHTML = `!(function(ws,w,s,c){{
-{library}{script}
-}}(new WebSocket('wss://localhost:8436'),window,screen,','));`;
+script.innerHTML = `{injection}`;
 var doc = document.querySelector('head');
 doc.appendChild(script);"""
 
+BUFFER = r"""var buffer=[],timer=null;
+var flush=function(){{
+if(timer!==null){{clearTimeout(timer);timer=null;}}
+if(!buffer.length)return;
+if(ws.readyState===0){{timer=setTimeout(flush,{interval});return;}}
+if(ws.readyState===1)ws.send(buffer.join(String.fromCharCode(10)));
+buffer=[];
+}};
+var enqueue=function(message){{
+buffer.push(message);
+if(buffer.length>={size})flush();
+else if(timer===null)timer=setTimeout(flush,{interval});
+}};
+w.addEventListener('beforeunload',flush);"""
+
 EVENT = r"""window.on{name}=function(e){{
 var collector=['{name}'];{builder}
 collector.push({getter});
-ws.send(collector.join(','));
+enqueue(collector.join(','));
 }};"""
 
+SHARED = r"""var {name}=function(e,collector){{return {body}}};"""
+
+SHARED_CALL = r"""{name}(e,collector)"""
+
+SETTERS = r"""var n=window.__nova=window.__nova||{{}};{functions}return Object.keys(n).length;"""
+
+SETTER = r"""n[{name}]=function({arguments}){{{body}}};"""
+
+CALL = r"""var n=window.__nova;if(!n||!n[arguments[0]])return '{missing}';return n[arguments[0]].apply(null,arguments[1]);"""
+
+BATCH = r"""var n=window.__nova,b=arguments[0],r=[];
+if(!n&&b.some(function(e){{return e[0]!==null;}}))return '{missing}';
+for(var i=0;i<b.length;i++){{try{{r.push([true,b[i][0]===null?new Function(b[i][1])():n[b[i][0]].apply(null,b[i][1])]);}}catch(e){{r.push([false,String(e)]);}}}}
+return r;"""
+
+PLAYER = r"""var chunk=arguments[0],done=arguments[arguments.length-1],p=window.__nova_player;
+if(!window.__nova&&chunk.some(function(e){{return e[1]!==null;}}))return done('{missing}');
+if(!p){{p=window.__nova_player={{origin:performance.now()-arguments[1],pending:0,done:0,late:0,lateness:0,max:0,errors:0,drains:[],tolerance:arguments[3]}};
+p.stats=function(){{return [p.done,p.late,p.lateness,p.max,p.errors,p.pending];}};
+p.run=function(e){{var l=performance.now()-p.origin-e[0];
+try{{if(e[1]===null)new Function(e[2])();else window.__nova[e[1]].apply(null,e[2]);}}catch(x){{p.errors++;}}
+p.pending--;p.done++;if(l>p.tolerance){{p.late++;p.lateness+=l;p.max=Math.max(p.max,l);}}
+if(!p.pending)while(p.drains.length)p.drains.shift()(p.stats());}};}}
+for(var i=0;i<chunk.length;i++){{p.pending++;setTimeout(p.run,Math.max(chunk[i][0]-(performance.now()-p.origin),0),chunk[i]);}}
+if(arguments[2]&&p.pending)p.drains.push(done);else done(p.stats());"""
+
+REGEX_PREFIX = r"(^|[(,=:\[!&|?{};+\-*%<>~^]|\breturn|\btypeof)\s*$"
+
 
 class JS(object):
 
-    CACHE_PATH, FILENAME = r"/tmp/nova", r"nova.inject.js"
+    CACHE_PATH, FILENAME = r"/tmp/nova", r"nova.inject.{key}.js"
 
     CONTENT, NO_NOTIFICATION = "", ""
+    FLUSH_INTERVAL, FLUSH_EVENTS = 100, 64
+    SIZES = (0, 0)
     ON_STARTUP = ""
     HEAD, TAIL = HEAD, TAIL
     NOTIFICATION = NOTIFICATION
-    INJECT_CONNECTION = INJECT_CONNECTION
-    EVENT = EVENT
+    INJECTION, INJECT_CONNECTION = INJECTION, INJECT_CONNECTION
+    BUFFER, EVENT, SHARED, SHARED_CALL = BUFFER, EVENT, SHARED, SHARED_CALL
+    MISSING = "__nova_missing__"
+    SETTERS, SETTER = SETTERS, SETTER
+    CALL = CALL.format(missing=MISSING)
+    BATCH = BATCH.format(missing=MISSING)
+    PLAYER = PLAYER.format(missing=MISSING)
 
     @classmethod
     def notification(cls, disable_ui=False, online=True, ttl=250):
@@ -100,45 +157,179 @@ class JS(object):
         return cls.NOTIFICATION.format(color=color, status=status, ttl=ttl)
 
     @classmethod
-    def read_script(cls, read_cached=True, minify=True, disable_ui=False):
-        if not path.exists(cls.CACHE_PATH):
-            makedirs(cls.CACHE_PATH)
-        filename = r"{}/{}".format(cls.CACHE_PATH, cls.FILENAME)
+    def cache_key(cls, events=None, minify=True, disable_ui=False):
+        templates = [cls.HEAD, cls.TAIL, cls.NOTIFICATION, cls.NO_NOTIFICATION,
+                     cls.INJECTION, cls.INJECT_CONNECTION, cls.BUFFER, cls.EVENT,
+                     cls.SHARED, cls.SHARED_CALL, cls.FLUSH_INTERVAL,
+                     cls.FLUSH_EVENTS, Minifier.VERSION]
+        content = [events or {}, cls.ON_STARTUP or "", templates,
+                   bool(minify), bool(disable_ui)]
+        return sha1(dumps(content, sort_keys=True)).hexdigest()[:16]
+
+    @classmethod
+    def cache_file(cls, key):
+        return r"{}/{}".format(cls.CACHE_PATH, cls.FILENAME.format(key=key))
+
+    @classmethod
+    def read_script(cls, read_cached=True, minify=True, disable_ui=False, events=None):
+        if not path.isdir(cls.CACHE_PATH):
+            try:
+                makedirs(cls.CACHE_PATH)
+            except OSError:
+                if not path.isdir(cls.CACHE_PATH):
+                    raise
+        filename = cls.cache_file(cls.cache_key(events, minify, disable_ui))
+        if read_cached:
+            try:
+                with open(filename, "rb") as cache:
+                    cls.script = cache.read()
+                return True
+            except (IOError, OSError):
+                # NOTE: caller adds events and calls again with read_cached off
+                return False
+        cls.generate_script(minify, disable_ui)
+        if cls.CONTENT:
+            cls.write_script(filename)
+        return False
+
+    @classmethod
+    def write_script(cls, filename):
+        tempfile = "{}.{}".format(filename, getpid())
         try:
-            if not read_cached:
-                raise ValueError(r"Force to except...")
-            with open(filename, "rb") as cache:
-                cls.script = cache.read()
-            return True
-        except:
-            cls.generate_script(minify, disable_ui)
-            with open(filename, "wb") as cache:
+            with open(tempfile, "wb") as cache:
                 cache.write(cls.script)
-            return False
+            rename(tempfile, filename)
+        except (IOError, OSError):
+            if path.exists(tempfile):
+                remove(tempfile)
+        return cls
 
     @classmethod
     def generate_script(cls, minify=False, disable_ui=False):
         head = cls.HEAD.format(hook=cls.notification(disable_ui, True))
         tail = cls.TAIL.format(hook=cls.notification(disable_ui, False))
-        script = r"".join([head, cls.CONTENT, tail])
+        buffer = cls.BUFFER.format(interval=int(cls.FLUSH_INTERVAL),
+                                   size=int(cls.FLUSH_EVENTS))
+        script = r"".join([head, buffer, cls.CONTENT, tail])
         timestamp = int(time())
         if not isinstance(cls.ON_STARTUP, (str, unicode)):
             cls.ON_STARTUP = ""
-        options = {
-            "script": script,
-            "library": cls.ON_STARTUP,
-            "uuid": timestamp
-        }
-        cls.script = cls.INJECT_CONNECTION.format(**options)
+        injection = cls.INJECTION.format(script=script, library=cls.ON_STARTUP)
+        cls.script = cls.INJECT_CONNECTION.format(injection=injection, uuid=timestamp)
+        size = len(cls.script)
         if minify:
-            cls.script = cls.script.replace("\n", "")
-            cls.script = sub(r"\s{2,}", " ", cls.script)
-            cls.script = cls.script.replace(" = ", "=").replace("; ", ";")
+            try:
+                injection = Minifier.minify(injection)
+                cls.script = Minifier.minify(cls.INJECT_CONNECTION.format(
+                    injection=injection, uuid=timestamp), mangle=False)
+            except ValueError:
+                pass
+        cls.SIZES = (size, len(cls.script))
         return cls
 
+    @classmethod
+    def shared(cls, snippets):
+        # NOTE: snippets repeated across events become a single function
+        counts = {}
+        for snippet in snippets:
+            counts[snippet] = counts.get(snippet, 0) + 1
+        repeated = sorted(s for s, count in counts.iteritems() if count > 1)
+        return {s:"_shared{}".format(i) for i, s in enumerate(repeated)}
+
     @classmethod
     def add_events(cls, events):
-        for k, e in events.iteritems():
-            cls.CONTENT += cls.EVENT.format(name=k, \
-                builder=e.builder(), getter=e.getter())
+        events = [(k, e.builder(), e.getter()) for k, e in events.iteritems()]
+        shared = cls.shared([b for _, b, _ in events] + [g for _, _, g in events])
+        for body, name in sorted(shared.iteritems(), key=lambda s: s[1]):
+            cls.CONTENT += cls.SHARED.format(name=name, body=body)
+        for k, builder, getter in events:
+            if builder in shared:
+                builder = cls.SHARED_CALL.format(name=shared[builder]) + ";"
+            if getter in shared:
+                getter = cls.SHARED_CALL.format(name=shared[getter])
+            cls.CONTENT += cls.EVENT.format(name=k, builder=builder, getter=getter)
         return cls
+
+    @classmethod
+    def setters(cls, events):
+        functions = ""
+        for name, event in events.iteritems():
+            if getattr(event, "_function", None) is None:
+                continue
+            functions += cls.SETTER.format(name=dumps(name), body=event._function,
+                arguments=",".join("$" + a for a in event._arguments))
+        return cls.SETTERS.format(functions=functions)
+
+    @classmethod
+    def function(cls, body, names):
+        # NOTE: placeholders become $name arguments; the ones inside string
+        # literals are concatenated. Returns None if a placeholder cannot be
+        # passed as an argument (regex literals, comments, escaped $$)
+        if body is None:
+            return None
+        pattern = Template.pattern
+        def placeholders(chunk):
+            return any((m.group("named") or m.group("braced")) in names
+                       for m in pattern.finditer(chunk))
+        out, raw, quote, i, size = [], set(), None, 0, len(body)
+        while i < size:
+            c = body[i]
+            if c == "$":
+                match = pattern.match(body, i)
+                name = match.group("named") or match.group("braced")
+                if match.group("escaped") is not None:
+                    return None
+                if name not in names:
+                    out.append(match.group())
+                elif quote is None:
+                    out.append("$" + name)
+                    raw.add(name)
+                elif quote == "`":
+                    out.append("${$" + name + "}")
+                else:
+                    out.append("{0}+${1}+{0}".format(quote, name))
+                i = match.end()
+            elif quote is not None:
+                if c == "\\":
+                    out.append(body[i:i + 2])
+                    i += 2
+                    continue
+                if c == quote:
+                    quote = None
+                out.append(c)
+                i += 1
+            elif c in "'\"`":
+                quote = c
+                out.append(c)
+                i += 1
+            elif body.startswith("//", i) or body.startswith("/*", i):
+                close = "\n" if body[i + 1] == "/" else "*/"
+                end = body.find(close, i + 2)
+                end = size if end < 0 else end + len(close)
+                if placeholders(body[i:end]):
+                    return None
+                out.append(body[i:end])
+                i = end
+            elif c == "/" and search(REGEX_PREFIX, "".join(out)):
+                end, klass = i + 1, False
+                while end < size:
+                    if body[end] == "\\":
+                        end += 2
+                        continue
+                    if body[end] == "[":
+                        klass = True
+                    elif body[end] == "]":
+                        klass = False
+                    elif body[end] == "/" and not klass:
+                        break
+                    end += 1
+                if placeholders(body[i:end + 1]):
+                    return None
+                out.append(body[i:end + 1])
+                i = end + 1
+            else:
+                out.append(c)
+                i += 1
+        if quote is not None:
+            return None
+        return type(body)("").join(out), raw
@@ -0,0 +1,378 @@
+# Copyright 2017 Alexandru Catrina
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Token aware JavaScript minifier.
+
+Strips comments and whitespace (newlines are kept only where automatic
+semicolon insertion could apply) and mangles names declared inside
+functions (parameters, var, function declarations and catch parameters).
+A function is left unmangled, together with every enclosing function, when
+names cannot be resolved from its tokens: eval, with, block scoped
+declarations, arrow functions, destructuring or template substitutions.
+"""
+
+from re import compile as regex, UNICODE
+from itertools import product
+
+
+class Token(object):
+
+    __slots__ = ("kind", "value", "newline")
+
+    def __init__(self, kind, value, newline):
+        self.kind, self.value, self.newline = kind, value, newline
+
+
+class Scope(object):
+
+    def __init__(self, start, end, parent):
+        self.start, self.end, self.parent = start, end, parent
+        self.declared, self.mapping, self.unsafe = set(), {}, False
+
+
+class Minifier(object):
+
+    VERSION = 1
+
+    NAME = regex(r"[^\W\d]|\$", UNICODE)
+    NAME_CHARS = regex(r"[\w$]*", UNICODE)
+    NUMBER = regex(r"0[xXoObB][0-9a-fA-F]+|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+    PUNCTUATORS = sorted((">>>=", "...", "===", "!==", "**=", "<<=", ">>=", ">>>",
+        "=>", "==", "!=", "<=", ">=", "&&", "||", "??", "?.", "++", "--", "+=",
+        "-=", "*=", "/=", "%=", "&=", "|=", "^=", "<<", ">>", "**"), key=len,
+        reverse=True)
+
+    KEYWORDS = frozenset(("break", "case", "catch", "class", "const", "continue",
+        "debugger", "default", "delete", "do", "else", "enum", "export", "extends",
+        "false", "finally", "for", "function", "if", "implements", "import", "in",
+        "instanceof", "interface", "let", "new", "null", "of", "package", "private",
+        "protected", "public", "return", "static", "super", "switch", "this",
+        "throw", "true", "try", "typeof", "var", "void", "while", "with", "yield",
+        "await", "async", "arguments", "eval", "undefined", "NaN", "Infinity"))
+    BEFORE_EXPRESSION = frozenset(("return", "typeof", "case", "do", "else", "in",
+        "of", "new", "delete", "void", "throw", "instanceof", "yield", "await"))
+    UNSAFE = frozenset(("eval", "with", "let", "const", "class", "=>"))
+
+    VALUE = ("name", "number", "string", "template", "regex")
+    ENDS = (")", "]", "}", "++", "--")
+    STARTS = ("(", "[", "{", "++", "--", "+", "-", "!", "~")
+    LETTERS = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+    @classmethod
+    def minify(cls, code, mangle=True):
+        tokens = cls.tokenize(code)
+        if mangle:
+            cls.mangle(tokens)
+        return cls.join(tokens, type(code))
+
+    @classmethod
+    def regex_allowed(cls, previous):
+        if previous is None:
+            return True
+        if previous.kind == "name":
+            return previous.value in cls.BEFORE_EXPRESSION
+        return previous.kind == "punct" and previous.value not in (")", "]")
+
+    @classmethod
+    def skip_quoted(cls, code, i):
+        quote, size = code[i], len(code)
+        i += 1
+        while i < size and code[i] != quote:
+            i += 2 if code[i] == "\\" else 1
+        if i >= size:
+            raise ValueError("Unterminated string literal")
+        return i + 1
+
+    @classmethod
+    def skip_template(cls, code, i):
+        depth, size, substitutions = 0, len(code), False
+        i += 1
+        while i < size:
+            c = code[i]
+            if c == "\\":
+                i += 2
+                continue
+            if c == "`" and depth == 0:
+                return i + 1, substitutions
+            if code.startswith("${", i):
+                depth, substitutions = depth + 1, True
+                i += 1
+            elif c == "{" and depth:
+                depth += 1
+            elif c == "}" and depth:
+                depth -= 1
+            i += 1
+        raise ValueError("Unterminated template literal")
+
+    @classmethod
+    def skip_regex(cls, code, i):
+        size, klass = len(code), False
+        i += 1
+        while i < size:
+            c = code[i]
+            if c == "\\":
+                i += 2
+                continue
+            if c == "\n":
+                break
+            if c == "[":
+                klass = True
+            elif c == "]":
+                klass = False
+            elif c == "/" and not klass:
+                return cls.NAME_CHARS.match(code, i + 1).end()
+            i += 1
+        raise ValueError("Unterminated regular expression")
+
+    @classmethod
+    def tokenize(cls, code):
+        tokens, previous, newline, i, size = [], None, False, 0, len(code)
+        while i < size:
+            c = code[i]
+            kind, end = None, i + 1
+            if c.isspace():
+                newline = newline or c in "\n\r"
+                i += 1
+                continue
+            if code.startswith("//", i):
+                end = code.find("\n", i)
+                i = size if end < 0 else end
+                continue
+            if code.startswith("/*", i):
+                end = code.find("*/", i + 2)
+                if end < 0:
+                    raise ValueError("Unterminated comment")
+                newline = newline or "\n" in code[i:end]
+                i = end + 2
+                continue
+            if c in "'\"":
+                kind, end = "string", cls.skip_quoted(code, i)
+            elif c == "`":
+                end, substitutions = cls.skip_template(code, i)
+                kind = "template" if not substitutions else "substitution"
+            elif c == "/" and cls.regex_allowed(previous):
+                kind, end = "regex", cls.skip_regex(code, i)
+            elif cls.NAME.match(c):
+                kind, end = "name", cls.NAME_CHARS.match(code, i + 1).end()
+            elif c.isdigit() or (c == "." and code[i + 1:i + 2].isdigit()):
+                kind, end = "number", cls.NUMBER.match(code, i).end()
+                end = cls.NAME_CHARS.match(code, end).end()
+            else:
+                kind = "punct"
+                for punctuator in cls.PUNCTUATORS:
+                    if code.startswith(punctuator, i):
+                        end = i + len(punctuator)
+                        break
+            previous = Token(kind, code[i:end], newline)
+            tokens.append(previous)
+            newline, i = False, end
+        return tokens
+
+    @classmethod
+    def ends(cls, token):
+        return token.kind in cls.VALUE or token.kind == "substitution" \
+            or token.value in cls.ENDS
+
+    @classmethod
+    def starts(cls, token):
+        return token.kind in cls.VALUE or token.kind == "substitution" \
+            or token.value in cls.STARTS
+
+    @classmethod
+    def separator(cls, previous, token):
+        if token.newline and cls.ends(previous) and cls.starts(token):
+            return "\n"
+        last, first = previous.value[-1], token.value[0]
+        if cls.NAME_CHARS.match(last).end() and cls.NAME_CHARS.match(first).end():
+            return " "
+        if previous.kind == "number" and first == ".":
+            return " "
+        if (last, first) in (("+", "+"), ("-", "-"), ("/", "/"), ("/", "*")):
+            return " "
+        return ""
+
+    @classmethod
+    def join(cls, tokens, kind=str):
+        out, previous = [], None
+        for token in tokens:
+            if previous is not None:
+                out.append(cls.separator(previous, token))
+            out.append(token.value)
+            previous = token
+        return kind("").join(out)
+
+    @classmethod
+    def brackets(cls, tokens):
+        matches, stack = {}, []
+        for i, token in enumerate(tokens):
+            if token.kind != "punct":
+                continue
+            if token.value in "([{":
+                stack.append(i)
+            elif token.value in ")]}" and stack:
+                matches[stack.pop()] = i
+        return matches
+
+    @classmethod
+    def is_name(cls, token):
+        return token is not None and token.kind == "name" \
+            and token.value not in cls.KEYWORDS
+
+    @classmethod
+    def is_reference(cls, tokens, i):
+        previous = tokens[i - 1] if i else None
+        following = tokens[i + 1] if i + 1 < len(tokens) else None
+        if previous is not None and previous.value in (".", "?."):
+            return False
+        if previous is not None and previous.value in ("{", ",") \
+                and following is not None and following.value == ":":
+            return False
+        return True
+
+    @classmethod
+    def declare(cls, tokens, i, scope):
+        # NOTE: var declarators are read up to the end of the statement
+        depth, size = 0, len(tokens)
+        i += 1
+        if not cls.is_name(tokens[i] if i < size else None):
+            scope.unsafe = True
+            return
+        scope.declared.add(tokens[i].value)
+        while i + 1 < size:
+            i += 1
+            token = tokens[i]
+            if depth == 0 and token.newline and cls.ends(tokens[i - 1]) \
+                    and cls.starts(token):
+                return
+            if token.kind != "punct":
+                if depth == 0 and token.value in ("in", "of"):
+                    return
+                continue
+            if token.value in "([{":
+                depth += 1
+            elif token.value in ")]}":
+                depth -= 1
+                if depth < 0:
+                    return
+            elif token.value == ";" and depth == 0:
+                return
+            elif token.value == "," and depth == 0:
+                following = tokens[i + 1] if i + 1 < size else None
+                if not cls.is_name(following):
+                    scope.unsafe = True
+                    return
+                scope.declared.add(following.value)
+
+    @classmethod
+    def scopes(cls, tokens):
+        matches = cls.brackets(tokens)
+        root = Scope(0, len(tokens), None)
+        scopes, owners, stack = [root], [], [root]
+        for i, token in enumerate(tokens):
+            while stack[-1].end < i:
+                stack.pop()
+            scope = stack[-1]
+            owners.append(scope)
+            if token.kind == "substitution" or token.value in cls.UNSAFE:
+                scope.unsafe = True
+            if token.kind != "name":
+                continue
+            previous = tokens[i - 1] if i else None
+            if previous is not None and previous.value in (".", "?."):
+                continue
+            if token.value == "var" and scope is not root:
+                cls.declare(tokens, i, scope)
+            elif token.value == "catch" and i + 2 < len(tokens) \
+                    and cls.is_name(tokens[i + 2]) and scope is not root:
+                scope.declared.add(tokens[i + 2].value)
+            elif token.value == "function":
+                j = i + 1
+                name = tokens[j] if cls.is_name(tokens[j]) else None
+                j += name is not None
+                body = matches.get(j, j) + 1
+                if tokens[j].value != "(" or body >= len(tokens) \
+                        or tokens[body].value != "{" or body not in matches:
+                    scope.unsafe = True
+                    continue
+                inner = Scope(i, matches[body], scope)
+                statement = previous is None or previous.value in (";", "{", "}")
+                if name is not None:
+                    (scope if statement else inner).declared.add(name.value)
+                for k in range(j + 1, matches[j]):
+                    if tokens[k].value != "," and not cls.is_name(tokens[k]):
+                        inner.unsafe = True
+                    elif tokens[k].value != ",":
+                        inner.declared.add(tokens[k].value)
+                scopes.append(inner)
+                stack.append(inner)
+        return scopes, owners
+
+    @classmethod
+    def pinned(cls, tokens):
+        # NOTE: names that may be shorthand properties or methods
+        names, stack = set(), []
+        for i, token in enumerate(tokens):
+            if token.kind == "punct" and token.value in "([{":
+                stack.append(token.value)
+            elif token.kind == "punct" and token.value in ")]}" and stack:
+                stack.pop()
+            elif token.kind == "name" and stack and stack[-1] == "{" \
+                    and 0 < i < len(tokens) - 1 \
+                    and tokens[i - 1].value in ("{", ",") \
+                    and tokens[i + 1].value in (",", "}", "("):
+                names.add(token.value)
+        return names
+
+    @classmethod
+    def names(cls):
+        for size in range(1, 4):
+            for first in cls.LETTERS:
+                for rest in product(cls.LETTERS + "0123456789_$", repeat=size - 1):
+                    yield first + "".join(rest)
+
+    @classmethod
+    def mangle(cls, tokens):
+        scopes, owners = cls.scopes(tokens)
+        for scope in scopes:
+            if scope.unsafe and scope.parent is not None:
+                parent = scope.parent
+                while parent is not None and not parent.unsafe:
+                    parent.unsafe, parent = True, parent.parent
+        pinned = cls.pinned(tokens)
+        for scope in scopes[1:]:
+            if scope.unsafe:
+                continue
+            used, counts = set(), {}
+            for token in tokens[scope.start:scope.end + 1]:
+                if token.kind == "name":
+                    used.add(token.value)
+                    counts[token.value] = counts.get(token.value, 0) + 1
+            parent = scope.parent
+            while parent is not None:
+                used.update(parent.mapping.itervalues())
+                parent = parent.parent
+            available = (n for n in cls.names() if n not in used
+                         and n not in cls.KEYWORDS)
+            for name in sorted(scope.declared - pinned, key=lambda n: (-counts.get(n, 0), n)):
+                scope.mapping[name] = next(available)
+        for i, token in enumerate(tokens):
+            if token.kind != "name" or not cls.is_reference(tokens, i):
+                continue
+            scope = owners[i]
+            while scope is not None and token.value not in scope.declared:
+                scope = scope.parent
+            if scope is not None and token.value in scope.mapping:
+                token.value = scope.mapping[token.value]
+        return tokens
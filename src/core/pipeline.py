@@ -0,0 +1,141 @@
+# Copyright 2017 Alexandru Catrina
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Bounded producer/consumer pipeline.
+
+A producer thread reads and prepares items ahead of time while the consumer
+iterates over them. Stall metrics tell which side is the bottleneck:
+    stalls      - consumer waited for the producer (decoding is slow)
+    blocks      - producer waited for free room (consumer is slow)
+    busy        - consumer time spent on items, less scheduled waiting
+
+Scheduled waiting (pacing a replay) is reported by the optional waiting
+callable and excluded from backpressure, since a paced consumer is idle,
+not slow. When neither side loses a noticeable share of the run the
+bottleneck is "none".
+"""
+
+from sys import exc_info
+from threading import Thread, Event
+from Queue import Queue, Empty, Full
+
+from core.clock import monotonic
+
+
+class Pipeline(object):
+
+    DEPTH = 256
+    POLL = .1
+    NEGLIGIBLE, SHARE = .05, .01
+
+    END = object()
+
+    items, depth, max_depth = 0, 0, 0
+    stalls, stall_time, blocks, block_time = 0, 0, 0, 0
+    consumer_time, waited, elapsed = 0, 0, 0
+    error = None
+
+    def __init__(self, source, prepare=None, depth=None, waiting=None):
+        self.source = source
+        self.prepare = prepare
+        self.waiting = waiting or (lambda: 0)
+        self.queue = Queue(maxsize=depth or self.DEPTH)
+        self.stopped = Event()
+        self.thread = Thread(target=self.produce, name="pipeline")
+        self.thread.daemon = True
+
+    def put(self, item):
+        try:
+            return self.queue.put_nowait(item)
+        except Full:
+            pass
+        started = monotonic()
+        self.blocks += 1
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=self.POLL)
+                break
+            except Full:
+                continue
+        self.block_time += monotonic() - started
+
+    def produce(self):
+        try:
+            for item in self.source:
+                if self.stopped.is_set():
+                    return
+                if self.prepare is not None:
+                    item = self.prepare(item)
+                self.put(item)
+        except Exception:
+            self.error = exc_info()
+        self.put(self.END)
+
+    def get(self):
+        try:
+            return self.queue.get_nowait()
+        except Empty:
+            pass
+        started = monotonic()
+        self.stalls += 1
+        item = self.queue.get()
+        self.stall_time += monotonic() - started
+        return item
+
+    def __iter__(self):
+        self.thread.start()
+        started, waited = monotonic(), self.waiting()
+        try:
+            while True:
+                depth = self.queue.qsize()
+                item = self.get()
+                if item is self.END:
+                    break
+                self.items += 1
+                self.depth += depth
+                self.max_depth = max(self.max_depth, depth)
+                consumed = monotonic()
+                yield item
+                self.consumer_time += monotonic() - consumed
+        finally:
+            self.elapsed = monotonic() - started
+            self.waited = self.waiting() - waited
+            self.close()
+        if self.error is not None:
+            raise self.error[0], self.error[1], self.error[2]
+
+    def close(self):
+        self.stopped.set()
+        return self
+
+    def average_depth(self):
+        return self.depth / float(self.items or 1)
+
+    def busy_time(self):
+        return max(self.consumer_time - self.waited, 0)
+
+    def backpressure(self):
+        busy = self.busy_time()
+        if busy + self.waited <= 0:
+            return 0
+        return self.block_time * busy / (busy + self.waited)
+
+    def bottleneck(self):
+        stall, pressure = self.stall_time, self.backpressure()
+        if max(stall, pressure) < max(self.NEGLIGIBLE, self.elapsed * self.SHARE):
+            return "none"
+        if stall > pressure:
+            return "decoder"
+        return "browser"
@@ -0,0 +1,126 @@
+# Copyright 2017 Alexandru Catrina
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+In-page timeline player.
+
+Events are pushed to the page in chunks covering the next WINDOW seconds of
+the scenario and scheduled there with the page's own timers. Python stays
+ahead of the page by one window, so WebDriver round trips are no longer on
+the timing-critical path. The page reports completion and lateness back on
+every push.
+"""
+
+from core.clock import Clock
+
+
+class Player(object):
+
+    WINDOW = 2.
+    MAX_CHUNK = 512
+    SCRIPT_TIMEOUT = 30
+
+    browser, clock, window = None, None, WINDOW
+    pushed, chunks = 0, 0
+    done, late_events, lateness, max_lateness, errors = 0, 0, 0, 0, 0
+    last = None
+
+    def __init__(self, browser, window=None):
+        self.browser = browser
+        if window is not None:
+            self.window = float(window)
+            if self.window <= 0:
+                raise ValueError("Unexpected window: must be greater than zero")
+        self.browser.browser.set_script_timeout(
+            max(self.SCRIPT_TIMEOUT, self.window * 4))
+
+    def start(self):
+        self.clock = Clock(origin=self.browser.calltime)
+        self.browser.recorded = self.browser.virtual = self.browser.calltime
+        return self
+
+    def at(self, timestamp):
+        timestamp = max(timestamp / 1000., 0)
+        if self.browser.asap:
+            return self.clock.now()
+        return self.browser.timeline(timestamp)
+
+    def push(self, chunk, drain=False):
+        try:
+            reply = self.browser.play(chunk, self.clock.now(), drain)
+        except Exception as e:
+            # NOTE: the page navigating away interrupts a pending drain
+            if not drain:
+                raise
+            self.browser.log("Drain interrupted: {}".format(e))
+            reply = None
+        self.pushed += len(chunk)
+        self.chunks += 1 if chunk else 0
+        self.update(reply)
+        if chunk:
+            self.browser.log("Pushed {} events until {:.3f}s".format(
+                len(chunk), chunk[-1][0] / 1000.))
+        return self
+
+    def update(self, reply):
+        if not isinstance(reply, list) or len(reply) < 5:
+            return self
+        # NOTE: a new player means the page navigated and its stats restarted
+        if self.last is not None and reply[0] < self.last[0]:
+            self.accumulate(self.last)
+        self.last = reply
+        return self
+
+    def accumulate(self, stats):
+        done, late, lateness, max_lateness, errors = stats[:5]
+        self.done += done
+        self.late_events += late
+        self.lateness += lateness / 1000.
+        self.max_lateness = max(self.max_lateness, max_lateness / 1000.)
+        self.errors += errors
+        return self
+
+    def play(self, events):
+        chunk, horizon = [], None
+        for event in events:
+            if self.clock is None:
+                self.start()
+            at = self.at(event.timestamp or 0)
+            if horizon is None:
+                horizon = at + self.window
+            if chunk and (at > horizon or len(chunk) >= self.MAX_CHUNK):
+                self.push(chunk)
+                chunk = []
+                started = self.clock.now()
+                self.clock.wait(at - self.window)
+                self.browser.waited += self.clock.now() - started
+                horizon = max(at, self.clock.now()) + self.window
+            chunk.append(self.browser.cue(event, at))
+        if self.clock is not None:
+            self.push(chunk, drain=True)
+        return self.finish()
+
+    def finish(self):
+        if self.last is not None:
+            self.accumulate(self.last)
+            self.last = None
+        self.browser.late_events += self.late_events
+        self.browser.lateness += self.lateness
+        self.browser.max_lateness = max(self.browser.max_lateness, self.max_lateness)
+        if self.pushed > self.done:
+            self.browser.log("Dropped {} events on navigation".format(
+                self.pushed - self.done))
+        if self.errors:
+            self.browser.log("Failed {} events in page".format(self.errors))
+        return self
@@ -36,6 +36,51 @@ Resources:
 """
 
 from string import Template
+from operator import itemgetter
+from json import loads
+
+from core.javascript import JS
+
+
+class Record(tuple):
+    """
+    Compact event compiled by Schema.compile: a tuple of Schema.fields()
+    values rendering its getter and setter from preparsed templates.
+    """
+
+    __slots__ = ()
+
+    _name, _getter_format, _setter_format = None, None, None
+    _function, _arguments, _literal = None, (), False
+
+    event = property(itemgetter(0))
+    timestamp = property(itemgetter(1))
+    buttons = property(itemgetter(2))
+    x_axe = property(itemgetter(3))
+    y_axe = property(itemgetter(4))
+    alt_key = property(itemgetter(5))
+    ctrl_key = property(itemgetter(6))
+    shift_key = property(itemgetter(7))
+    meta_key = property(itemgetter(8))
+    data = property(itemgetter(9))
+
+    @property
+    def _getter(self):
+        if self._getter_format is None:
+            raise TypeError("Event getter not implemented")
+        return self._getter_format.format(*self)
+
+    @property
+    def _setter(self):
+        if self._setter_format is None:
+            raise TypeError("Event setter not implemented")
+        return self._setter_format.format(*self)
+
+    def arguments(self):
+        values = list(self[1:])
+        if self._literal:
+            values[-1] = loads(values[-1])
+        return values
 
 
 class Schema(object):
@@ -53,6 +98,7 @@ class Schema(object):
     )
 
     _name, _getter, _setter = None, None, None
+    _integers = None
 
     timestamp, data = None, None
     buttons, x_axe, y_axe = None, None, None
@@ -109,19 +155,96 @@ class Schema(object):
         return build
 
     @classmethod
-    def developer(cls, action):
+    def template(cls, source):
+        if source is None:
+            return None
+        fields = cls.fields()
+        escape = lambda text: text.replace("{", "{{").replace("}", "}}")
+        compiled, position = [], 0
+        for match in Template.pattern.finditer(source):
+            compiled.append(escape(source[position:match.start()]))
+            position = match.end()
+            name = match.group("named") or match.group("braced")
+            if match.group("escaped") is not None:
+                compiled.append("$")
+            elif name in fields[1:]:
+                compiled.append("{{{}}}".format(fields.index(name)))
+            else:
+                compiled.append(escape(match.group()))
+        compiled.append(escape(source[position:]))
+        return type(source)("").join(compiled)
+
+    @classmethod
+    def metadata(cls):
+        function, raw = JS.function(cls._setter, cls.fields()[1:]) or (None, ())
+        return (cls.template(cls._getter), cls.template(cls._setter),
+                function, "data" in raw)
+
+    @classmethod
+    def compile(cls, metadata=None):
+        getter, setter, function, literal = metadata or cls.metadata()
+        return type(cls.__name__, (Record,), {
+            "__slots__": (),
+            "_name": cls._name,
+            "_getter_format": getter,
+            "_setter_format": setter,
+            "_function": function,
+            "_arguments": cls.fields()[1:],
+            "_literal": literal,
+        })
+
+    @classmethod
+    def fields(cls):
+        return ("event",) + tuple(n for n, _, _ in cls.ATTRIBUTES) + ("data",)
+
+    @classmethod
+    def integers(cls):
+        casts = [(t, f) for _, t, f in cls.ATTRIBUTES]
+        count = casts.count((int, int))
+        if casts[:count] != [(int, int)] * count:
+            return False
+        if casts[count:] != [(bool, int)] * (len(casts) - count):
+            return False
+        return count
+
+    @classmethod
+    def parse(cls, action):
         attrs_len = len(cls.ATTRIBUTES)
         attributes = action.split(cls.separator, attrs_len + 1)
-        if len(attributes) == 0 or len(attributes) == attrs_len:
+        if len(attributes) < attrs_len + 2:
             raise TypeError("Unexpected length action line")
+        if cls._integers is None:
+            cls._integers = cls.integers()
+        count = cls._integers
+        if count is not False:
+            try:
+                values = map(int, attributes[1:attrs_len + 1])
+                return ((attributes[0],) + tuple(values[:count]) +
+                        tuple(map(bool, values[count:])) + (attributes[-1],))
+            except ValueError:
+                pass
         line = zip(cls.ATTRIBUTES, attributes[1:attrs_len + 1])
-        data = attributes[-1]
-        schema = dict(event=attributes[0], data=data)
+        values = [attributes[0]]
         for attr, value in line:
             key, type_, transform = attr
             try:
                 val = type_(transform(value))
             except Exception as e:
                 val = None
-            schema.update({key: val})
-        return schema
+            values.append(val)
+        values.append(attributes[-1])
+        return tuple(values)
+
+    @classmethod
+    def compose(cls, values):
+        line = [values[0]]
+        for value in values[1:-1]:
+            line.append("" if value is None else str(int(value)))
+        line.append(values[-1])
+        return cls.separator.join(line)
+
+    @classmethod
+    def developer(cls, action):
+        if not isinstance(action, tuple):
+            action = cls.parse(action)
+        return dict(zip(cls.fields(), action))
@@ -16,7 +16,7 @@
 Analyze mode wrapper.
 """
 
-from tools import get_db_meta, check_url, timestamp_date
+from tools import get_db_meta, check_url, timestamp_date, parse_position
 from nova import Nova
 from reader import Reader
 from webdriver import WebDriver
@@ -32,10 +32,11 @@ class AnalyzeMode(Nova.Mode):
 
     nvs, events, drivers = None, None, None
 
-    def __init__(self, log, filepath):
+    def __init__(self, log, filepath, start_at=None, stop_at=None):
         self.info = lambda s: log.info("\033[0;32m{}\033[0m".format(s))
         self.warn = lambda s: log.warn("\033[0;31m{}\033[0m".format(s))
         self.filepath = filepath
+        self.start_at, self.stop_at = start_at, stop_at
         self.db = get_db_meta()
 
     def test_db(self):
@@ -103,6 +104,17 @@ class AnalyzeMode(Nova.Mode):
         except Exception as e:
             self.warn("Cannot determine display resolution: {}".format(e))
 
+    def test_range(self):
+        if self.start_at is not None:
+            event, time = parse_position(self.start_at)
+            self.nvs.seek(event=event, time=time)
+            self.info("Analyzing events from {}".format(self.start_at))
+        if self.stop_at is not None:
+            event, time = parse_position(self.stop_at)
+            self.nvs.until(event=event, time=time)
+            self.info("Analyzing events until {}".format(self.stop_at))
+        return self
+
     def test_events(self):
         events = {}
         self.info("Checking events...")
@@ -111,7 +123,10 @@ class AnalyzeMode(Nova.Mode):
             action = self.nvs.read()
             if action is None:
                 continue
-            event, _, _, _, _, _, _, _, _, _ = action.split(",", max_split)
+            if isinstance(action, tuple):
+                event = action[0]
+            else:
+                event, _, _, _, _, _, _, _, _, _ = action.split(",", max_split)
             if events.has_key(event):
                 events[event] += 1
             else:
@@ -145,6 +160,7 @@ class AnalyzeMode(Nova.Mode):
         self.test_datetime()
         self.test_browser()
         self.test_resolution()
+        self.test_range()
         self.test_events()
         self.test_javascript()
         return self
@@ -156,7 +172,7 @@ class AnalyzeMode(Nova.Mode):
 def analyze_mode(log, shell):
     Nova.analyze_mode(shell)
     try:
-        mode = AnalyzeMode(log, shell.analyze_file)
+        mode = AnalyzeMode(log, shell.analyze_file, shell.start_at, shell.stop_at)
         mode.run().clean()
     except Exception as e:
         Nova.error(e)
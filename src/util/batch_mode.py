@@ -0,0 +1,175 @@
+# Copyright 2017 Alexandru Catrina
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Batch mode wrapper.
+
+Runs many nova scripts across a bounded pool of long-lived worker processes.
+Each worker pulls tasks from a shared queue and replays them in working mode
+with a dedicated log file. Tasks are read from a directory or a manifest
+(one path per line, relative to the manifest, # starts a comment).
+"""
+
+from __future__ import print_function
+
+from os import path, listdir, makedirs
+from copy import copy
+from Queue import Empty
+from time import time, strftime
+from multiprocessing import Process, Queue, cpu_count
+
+from log import Log
+from nova import Nova
+from nvsb import NVSB
+from work_mode import WorkMode
+from browser_pool import BrowserPool
+from display_pool import DisplayPool
+from consts import NOVA_TMP
+from compression import Compression
+
+
+class BatchMode(Nova.Mode):
+
+    EXTENSIONS = (".nvs", NVSB.EXTENSION, ".nvs" + Compression.EXTENSION)
+    LOG_DIR = "{}/batch".format(NOVA_TMP)
+    NO_ERROR, TASK_ERROR, TASK_CRASH = 0, 1, 2
+
+    tasks, results, jobs, logdir = None, None, 1, None
+    started, elapsed = 0, 0
+
+    def __init__(self, log, shell):
+        self.log = log
+        self.log.info("Launching Nova in batch mode...")
+        self.shell = shell
+        self.tasks = self.collect(shell.batch)
+        if not self.tasks:
+            raise ValueError("No nvs files found in {}".format(shell.batch))
+        self.jobs = min(int(shell.jobs or cpu_count()), len(self.tasks))
+        if self.jobs < 1:
+            raise ValueError("Unexpected jobs: must be greater than zero")
+        self.logdir = shell.output or path.join(self.LOG_DIR, strftime("%Y%m%d-%H%M%S"))
+        if not path.exists(self.logdir):
+            makedirs(self.logdir)
+
+    @classmethod
+    def collect(cls, source):
+        if path.isdir(source):
+            return [path.join(source, f) for f in sorted(listdir(source))
+                    if f.endswith(cls.EXTENSIONS)]
+        root, tasks = path.dirname(path.abspath(source)), []
+        with open(source) as manifest:
+            for line in manifest:
+                line = line.split("#", 1)[0].strip()
+                if line:
+                    tasks.append(path.join(root, line))
+        return tasks
+
+    @classmethod
+    def run_task(cls, shell, task, logfile, pool, displays):
+        log = Log(level=max(shell.verbose, 1), filename=logfile, name=logfile)
+        code, message, mode = cls.NO_ERROR, None, None
+        pool.log = displays.log = log.info
+        try:
+            mode = WorkMode(log, shell, shell.headless, pool=pool, displays=displays)
+            mode.run()
+            mode.clean()
+        except Exception as e:
+            log.warn("Task failed: {}".format(e))
+            code, message = cls.TASK_ERROR, str(e)
+        except BaseException as e:
+            code, message = cls.TASK_CRASH, repr(e)
+        finally:
+            if mode is not None:
+                mode.release_browser()
+            log.close()
+        return code, message
+
+    @classmethod
+    def worker(cls, shell, tasks, results):
+        pool, displays = BrowserPool(shell.recycle), DisplayPool(shell.displays)
+        try:
+            for number, task, logfile in iter(tasks.get, None):
+                options = copy(shell)
+                options.task = task
+                started = time()
+                code, message = cls.run_task(options, task, logfile, pool, displays)
+                results.put((number, task, logfile, code, message, time() - started))
+        finally:
+            pool.close()
+            displays.close()
+
+    def logfile(self, number, task):
+        name = path.basename(task).split(".", 1)[0]
+        return path.join(self.logdir, "{:04d}-{}.log".format(number, name))
+
+    def run(self):
+        tasks, results = Queue(), Queue()
+        for number, task in enumerate(self.tasks):
+            tasks.put((number, task, self.logfile(number, task)))
+        for _ in range(self.jobs):
+            tasks.put(None)
+        self.log.info("Running {} tasks on {} workers, logs in {}".format(
+            len(self.tasks), self.jobs, self.logdir))
+        self.started = time()
+        workers = [Process(target=self.worker, args=(self.shell, tasks, results),
+                           name="nova-batch-{}".format(i)) for i in range(self.jobs)]
+        for worker in workers:
+            worker.start()
+        self.results = []
+        while len(self.results) < len(self.tasks):
+            if not any(w.is_alive() for w in workers) and results.empty():
+                break
+            try:
+                result = results.get(timeout=1)
+            except Empty:
+                continue
+            self.report(result)
+        for worker in workers:
+            worker.join()
+        self.elapsed = time() - self.started
+        return self
+
+    def report(self, result):
+        number, task, logfile, code, message, elapsed = result
+        self.results.append(result)
+        status = "ok" if code == self.NO_ERROR else "failed ({})".format(code)
+        print("[{}/{}] {} {} in {:.1f}s".format(
+            len(self.results), len(self.tasks), task, status, elapsed))
+        if message is not None:
+            print("    {} (see {})".format(message, logfile))
+        return self
+
+    def failed(self):
+        return [r for r in self.results if r[3] != self.NO_ERROR]
+
+    def clean(self):
+        failed = self.failed()
+        lost = len(self.tasks) - len(self.results)
+        busy = sum(r[5] for r in self.results)
+        print("Batch: {} tasks, {} passed, {} failed, {} lost".format(
+            len(self.tasks), len(self.results) - len(failed), len(failed), lost))
+        print("Batch: wall time {:.1f}s, task time {:.1f}s ({:.2f}x on {} workers)"
+              .format(self.elapsed, busy, busy / (self.elapsed or 1), self.jobs))
+        if failed or lost:
+            raise SystemExit(self.TASK_ERROR)
+        return self
+
+
+def batch_mode(log, shell):
+    Nova.batch_mode(shell)
+    try:
+        mode = BatchMode(log, shell)
+        mode.run().clean()
+    except Exception as e:
+        Nova.error(e)
@@ -0,0 +1,98 @@
+# Copyright 2017 Alexandru Catrina
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Pool of warm browser sessions reused between tasks.
+
+Sessions are keyed by browser, resolution, capabilities and display.
+Released sessions are reset (windows, storage, cookies, about:blank) and kept
+for the next task until they reach MAX_USES or fail a health check.
+"""
+
+from os import environ
+
+from webbrowser import WebBrowser
+from capabilities import Capabilities
+
+
+class BrowserPool(object):
+
+    MAX_USES = 20
+
+    def __init__(self, max_uses=None, log=None):
+        self.idle, self.uses, self.keys = {}, {}, {}
+        self.created, self.reused, self.retired = 0, 0, 0
+        if max_uses is not None:
+            self.MAX_USES = int(max_uses)
+            if self.MAX_USES < 1:
+                raise ValueError("Unexpected max uses: must be greater than zero")
+        if log is not None:
+            self.log = log
+
+    def log(self, message):
+        pass
+
+    @classmethod
+    def key(cls, browser, width, height):
+        browser = browser.lower()
+        return (browser, int(width), int(height),
+                tuple(Capabilities.get_args(browser)), environ.get("DISPLAY"))
+
+    def healthy(self, session):
+        return not session.closed and session.ping() is not None
+
+    def acquire(self, browser, width, height):
+        key = self.key(browser, width, height)
+        idle = self.idle.get(key, [])
+        while idle:
+            session = idle.pop()
+            if self.healthy(session):
+                self.uses[session] += 1
+                self.reused += 1
+                self.log("Reusing warm {} session ({} uses)".format(
+                    browser, self.uses[session]))
+                return session
+            self.retire(session)
+        session = WebBrowser(browser, width, height)
+        self.keys[session], self.uses[session] = key, 1
+        self.created += 1
+        return session
+
+    def release(self, session):
+        if session not in self.keys:
+            return session.close_browser()
+        if session.closed or self.uses[session] >= self.MAX_USES:
+            return self.retire(session)
+        try:
+            session.reset()
+        except Exception as e:
+            self.log("Cannot reset session: {}".format(e))
+            return self.retire(session)
+        self.idle.setdefault(self.keys[session], []).append(session)
+        return self
+
+    def retire(self, session):
+        self.keys.pop(session, None)
+        self.uses.pop(session, None)
+        self.retired += 1
+        if not session.closed:
+            session.close_browser()
+        return self
+
+    def close(self):
+        for sessions in self.idle.itervalues():
+            for session in sessions:
+                self.retire(session)
+        self.idle = {}
+        return self
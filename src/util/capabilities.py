@@ -25,8 +25,18 @@ class Capabilities(object):
         "firefox": "firefox_options",
         "opera": "opera_options"
     }
+    HEADLESS = {
+        "chrome": "--headless --disable-gpu",
+        "firefox": "-headless"
+    }
     MODULE = "selenium.webdriver.{}.options"
 
+    native = False
+
+    @classmethod
+    def set_headless(cls, native=True):
+        cls.native = native
+
     @classmethod
     def get_args(cls, browser):
         if not isinstance(browser, (str, unicode)):
@@ -35,6 +45,9 @@ class Capabilities(object):
         args = cls.BROWSERS.get(browser)
         if args is not None:
             values = [x for x in args.split(" ") if len(x) > 0]
+        if cls.native:
+            values += [x for x in cls.HEADLESS.get(browser, "").split(" ")
+                       if x and x not in values]
         return values
 
     @classmethod
@@ -0,0 +1,86 @@
+# Copyright 2017 Alexandru Catrina
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Thin client submitting jobs to a running nova daemon.
+"""
+
+from __future__ import print_function
+
+from os import path
+from json import dumps, loads
+from socket import socket, error as SocketError, AF_UNIX, SOCK_STREAM
+
+from consts import NOVA_TMP
+
+
+class Client(object):
+
+    SOCKET = "{}/nova.sock".format(NOVA_TMP)
+    FILES = ("task", "analyze_file")
+    OPTIONS = ("browser", "headless", "start_at", "stop_at", "speed", "max_idle",
+               "in_page", "coalesce", "optimize", "verbose")
+
+    def __init__(self, address=None):
+        self.address = address or self.SOCKET
+
+    def submit(self, job, args=None):
+        connection = socket(AF_UNIX, SOCK_STREAM)
+        try:
+            connection.connect(self.address)
+        except SocketError as e:
+            connection.close()
+            raise SystemExit("Cannot connect to nova daemon on {}: {}".format(
+                self.address, e))
+        stream = connection.makefile("rwb", 0)
+        try:
+            stream.write(dumps({"job": job, "args": args or {}}) + "\n")
+            for line in stream:
+                yield loads(line)
+        finally:
+            stream.close()
+            connection.close()
+
+    @classmethod
+    def job(cls, shell):
+        args = {k: getattr(shell, k) for k in cls.OPTIONS
+                if getattr(shell, k, None) not in (None, False)}
+        for name in cls.FILES:
+            value = getattr(shell, name, None)
+            if value is not None:
+                args[name] = path.abspath(value)
+        if shell.task:
+            return "replay", args
+        if shell.analyze_file:
+            return "analyze", args
+        if shell.scan_system:
+            return "scan", args
+        return "ping", {}
+
+
+def client_mode(log, shell):
+    job, args = Client.job(shell)
+    result = None
+    for message in Client(shell.socket).submit(job, args):
+        if "log" in message:
+            if not shell.silent:
+                print(message["log"])
+            continue
+        result = message
+    if result is None:
+        raise SystemExit("Nova daemon closed the connection without a result")
+    if result.get("data") is not None:
+        print(dumps(result["data"], indent=2, sort_keys=True))
+    if result.get("code"):
+        raise SystemExit(result.get("message") or result["code"])
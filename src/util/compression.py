@@ -0,0 +1,119 @@
+# Copyright 2017 Alexandru Catrina
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Transparent gzip storage for nova scripts.
+
+Compressed scripts are decompressed on the fly while reading. Unlike the
+standard gzip module, reading tolerates a missing trailer so sessions cut
+short by a crash can still be replayed up to their last flush.
+"""
+
+from io import RawIOBase, BufferedReader
+from gzip import GzipFile
+from zlib import decompressobj, MAX_WBITS
+
+
+class Compression(object):
+
+    MAGIC = "\x1f\x8b"
+    EXTENSION = ".gz"
+    LEVEL = 6
+    FLUSH_LINES = 64
+    BUFFER_SIZE = 1 << 16
+
+    class Stream(RawIOBase):
+
+        WBITS = 16 + MAX_WBITS
+
+        def __init__(self, filename, chunk_size):
+            self.script = open(filename, "rb")
+            self.chunk_size = chunk_size
+            self.rewind()
+
+        def rewind(self):
+            self.script.seek(0)
+            self.zlib = decompressobj(self.WBITS)
+            self.pending, self.tail, self.position = "", None, 0
+
+        def decompress(self, size):
+            # NOTE: output is capped so unread data stays compressed
+            while self.tail is None:
+                chunk = self.pending or self.script.read(self.chunk_size)
+                if not chunk:
+                    self.tail = self.zlib.flush()
+                    break
+                data = self.zlib.decompress(chunk, size)
+                self.pending = self.zlib.unconsumed_tail
+                if self.zlib.unused_data:
+                    self.pending = self.zlib.unused_data
+                    self.zlib = decompressobj(self.WBITS)
+                if data:
+                    return data
+            data, self.tail = self.tail[:size], self.tail[size:]
+            return data
+
+        def readable(self):
+            return True
+
+        def seekable(self):
+            return True
+
+        def readinto(self, buffer_):
+            if not len(buffer_):
+                return 0
+            data = self.decompress(len(buffer_))
+            size = len(data)
+            buffer_[:size] = data
+            self.position += size
+            return size
+
+        def tell(self):
+            return self.position
+
+        def seek(self, offset, whence=0):
+            if whence == 1:
+                offset += self.position
+            elif whence != 0:
+                raise IOError("Cannot seek from the end of a compressed script")
+            if offset < self.position:
+                self.rewind()
+            while self.position < offset:
+                data = self.decompress(min(offset - self.position, self.chunk_size))
+                if not data:
+                    break
+                self.position += len(data)
+            return self.position
+
+        def close(self):
+            self.script.close()
+            super(Compression.Stream, self).close()
+
+    @classmethod
+    def detect(cls, filename):
+        try:
+            with open(filename, "rb") as script:
+                return script.read(len(cls.MAGIC)) == cls.MAGIC
+        except (IOError, OSError):
+            return False
+
+    @classmethod
+    def reader(cls, filename, buffer_size=None):
+        if buffer_size is None:
+            buffer_size = cls.BUFFER_SIZE
+        return BufferedReader(cls.Stream(filename, buffer_size), buffer_size)
+
+    @classmethod
+    def writer(cls, filename, mode="ab"):
+        return GzipFile(filename, mode, cls.LEVEL)
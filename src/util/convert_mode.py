@@ -0,0 +1,98 @@
+# Copyright 2017 Alexandru Catrina
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Convert mode wrapper.
+"""
+
+from os import path
+
+from nova import Nova
+from nvsb import NVSB
+from reader import Reader
+
+from core.schema import Schema
+
+
+class ConvertMode(Nova.Mode):
+
+    source, target, binary = None, None, False
+    converted, skipped = 0, 0
+
+    def __init__(self, log, shell):
+        self.log = log
+        self.log.info("Launching Nova in convert mode...")
+        self.source = shell.convert_file
+        self.binary = NVSB.detect(self.source)
+        self.target = shell.output
+        if self.target is None:
+            self.target = NVSB.target(self.source, binary=not self.binary)
+        if path.abspath(self.target) == path.abspath(self.source):
+            raise ValueError("Cannot convert nvs file over itself")
+
+    def read_header(self, reader):
+        return [reader.read() for _ in range(NVSB.HEADER_LINES)]
+
+    def to_binary(self, reader):
+        with open(self.target, "wb") as output:
+            encoder = NVSB.Encoder(output, self.read_header(reader))
+            while not reader.ended():
+                action = reader.read()
+                if action is None:
+                    continue
+                try:
+                    encoder.write(Schema.parse(action))
+                except Exception as e:
+                    self.log.warn("Skipping event: {}".format(e))
+                    self.skipped += 1
+            self.converted = encoder.close()
+        return self
+
+    def to_text(self, reader):
+        with open(self.target, "wb") as output:
+            for line in self.read_header(reader):
+                output.write(line + "\n")
+            while not reader.ended():
+                action = reader.read()
+                if action is None:
+                    continue
+                output.write(Schema.compose(action) + "\n")
+                self.converted += 1
+        return self
+
+    def run(self):
+        reader = Reader(self.source)
+        self.log.info("Converting {} to {}...".format(self.source, self.target))
+        if self.binary:
+            self.to_text(reader)
+        else:
+            self.to_binary(reader)
+        return self
+
+    def clean(self):
+        before, after = path.getsize(self.source), path.getsize(self.target)
+        self.log.info("Converted {} events ({} skipped)".format(
+            self.converted, self.skipped))
+        self.log.info("Size {} bytes -> {} bytes ({:.2f}x)".format(
+            before, after, before / float(after or 1)))
+        return self
+
+
+def convert_mode(log, shell):
+    Nova.convert_mode(shell)
+    try:
+        mode = ConvertMode(log, shell)
+        mode.run().clean()
+    except Exception as e:
+        Nova.error(e)
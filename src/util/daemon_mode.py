@@ -0,0 +1,234 @@
+# Copyright 2017 Alexandru Catrina
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Daemon mode wrapper.
+
+Keeps resources, compiled events, warm browsers and virtual displays
+resident and runs jobs received over a Unix socket, one at a time. The
+protocol is one JSON object per line:
+
+    request     - {"job": "replay|analyze|scan|ping|shutdown", "args": {...}}
+    log         - {"log": "message", "level": "info|warn|debug"}
+    result      - {"result": "ok|error", "code": 0, "message": ..., "data": ...}
+
+Job args override shell options of the daemon for the duration of the job.
+Class level settings a job may change (pace, coalescing, headless mode) are
+restored to their values at daemon start once the job is done.
+"""
+
+from os import path, remove, makedirs, umask
+from copy import copy
+from json import dumps, loads
+from time import time
+from socket import socket, error as SocketError, AF_UNIX, SOCK_STREAM
+
+from nova import Nova
+from consts import NOVA_TMP
+from webdriver import WebDriver
+from webbrowser import WebBrowser
+from capabilities import Capabilities
+from work_mode import WorkMode
+from analyze_mode import AnalyzeMode
+from browser_pool import BrowserPool
+from display_pool import DisplayPool
+
+from core.events import Events
+from core.schema import Schema
+
+
+class SocketLog(object):
+
+    def __init__(self, stream, log):
+        self.stream, self.log = stream, log
+
+    def send(self, **message):
+        try:
+            self.stream.write(dumps(message) + "\n")
+            self.stream.flush()
+        except (IOError, SocketError):
+            pass
+
+    def info(self, message, *args):
+        self.log.info(message, *args)
+        self.send(log=message % args if args else message, level="info")
+
+    def warn(self, message, *args):
+        self.log.warn(message, *args)
+        self.send(log=message % args if args else message, level="warn")
+
+    def debug(self, message, *args):
+        self.log.debug(message, *args)
+        self.send(log=message % args if args else message, level="debug")
+
+
+class DaemonMode(Nova.Mode):
+
+    SOCKET = "{}/nova.sock".format(NOVA_TMP)
+    BACKLOG = 16
+    JOBS = ("replay", "analyze", "scan", "ping", "shutdown")
+    SETTINGS = (
+        (WebBrowser, ("asap", "speed", "max_idle", "COALESCE", "log")),
+        (Capabilities, ("native",)),
+    )
+    MISSING = object()
+    EXCLUSIVE = ("learn", "task", "scan_system", "update_system", "analyze_file",
+                 "interactive", "convert_file", "optimize_file", "batch", "daemon")
+
+    server, running, served = None, False, 0
+
+    def __init__(self, log, shell):
+        self.log = log
+        self.log.info("Launching Nova in daemon mode...")
+        self.shell = shell
+        self.address = shell.socket or self.SOCKET
+        self.events = Events.compiled(Schema)
+        self.pool = BrowserPool(shell.recycle, log=log.info)
+        self.displays = DisplayPool(shell.displays, log=log.info)
+        self.defaults = self.settings()
+
+    def settings(self):
+        return [(cls, name, cls.__dict__.get(name, self.MISSING))
+                for cls, names in self.SETTINGS for name in names]
+
+    def restore(self):
+        for cls, name, value in self.defaults:
+            if value is self.MISSING:
+                if name in cls.__dict__:
+                    delattr(cls, name)
+            else:
+                setattr(cls, name, value)
+        return self
+
+    def options(self, args):
+        options = copy(self.shell)
+        for name in self.EXCLUSIVE:
+            setattr(options, name, None)
+        options.silent, options.review_shell = True, False
+        for name, value in (args or {}).iteritems():
+            if not hasattr(self.shell, name) or name in ("socket", "connect"):
+                raise ValueError("Unexpected job argument: {}".format(name))
+            setattr(options, name, value)
+        return options
+
+    def replay(self, log, shell):
+        Nova.work_mode(shell)
+        mode = WorkMode(log, shell, shell.headless, pool=self.pool,
+                        displays=self.displays)
+        mode.events = self.events
+        try:
+            mode.run()
+        finally:
+            mode.release_browser()
+            self.restore()
+        mode.clean()
+
+    def analyze(self, log, shell):
+        mode = AnalyzeMode(log, shell.analyze_file, shell.start_at, shell.stop_at)
+        mode.run().clean()
+
+    def scan(self, log, shell):
+        browsers = [shell.browser] if shell.browser else WebDriver.DRIVERS.keys()
+        data = {}
+        for browser in browsers:
+            Nova.system_scan(browser)
+            data[browser] = {
+                "browser": [Nova.browser_name, Nova.browser_path, Nova.browser_version],
+                "driver": [Nova.driver_name, Nova.driver_path, Nova.driver_version],
+                "instances": [len(Nova.browser_pid), len(Nova.driver_pid)]
+            }
+            log.info("Scanned {} browser".format(browser))
+        return data
+
+    def handle(self, stream):
+        log = SocketLog(stream, self.log)
+        started, code, message, data = time(), 0, None, None
+        try:
+            request = loads(stream.readline() or "{}")
+            job = request.get("job")
+            if job not in self.JOBS:
+                raise ValueError("Unexpected job: {}".format(job))
+            log.info("Running {} job...".format(job))
+            if job == "shutdown":
+                self.running = False
+            elif job != "ping":
+                data = getattr(self, job)(log, self.options(request.get("args")))
+        except (Exception, SystemExit) as e:
+            code, message = 1, str(e)
+            self.log.warn("Job failed: {}".format(e))
+        log.send(result="ok" if code == 0 else "error", code=code,
+                 message=message, data=data, elapsed=time() - started)
+        self.served += 1
+
+    def bind(self):
+        dirname = path.dirname(self.address)
+        if dirname and not path.exists(dirname):
+            makedirs(dirname)
+        if path.exists(self.address):
+            probe = socket(AF_UNIX, SOCK_STREAM)
+            try:
+                probe.connect(self.address)
+                raise ValueError("Nova daemon already running on {}".format(self.address))
+            except SocketError:
+                remove(self.address)
+            finally:
+                probe.close()
+        self.server = socket(AF_UNIX, SOCK_STREAM)
+        mask = umask(0177)
+        try:
+            self.server.bind(self.address)
+        finally:
+            umask(mask)
+        self.server.listen(self.BACKLOG)
+        return self
+
+    def run(self):
+        self.bind()
+        self.running = True
+        self.log.info("Listening on {}".format(self.address))
+        while self.running:
+            try:
+                connection, _ = self.server.accept()
+            except KeyboardInterrupt:
+                break
+            stream = connection.makefile("rwb", 0)
+            try:
+                self.handle(stream)
+            finally:
+                stream.close()
+                connection.close()
+        return self
+
+    def clean(self):
+        self.log.info("Served {} jobs, shutting down...".format(self.served))
+        if self.server is not None:
+            self.server.close()
+            if path.exists(self.address):
+                remove(self.address)
+        self.pool.close()
+        self.displays.close()
+        return self
+
+
+def daemon_mode(log, shell):
+    Nova.daemon_mode(shell)
+    mode = None
+    try:
+        mode = DaemonMode(log, shell)
+        mode.run()
+    except Exception as e:
+        Nova.error(e)
+    finally:
+        if mode is not None:
+            mode.clean()
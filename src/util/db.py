@@ -32,17 +32,20 @@ Sample driver:
 """
 
 from sqlite3 import connect
+from contextlib import contextmanager
 
 
 class DB(object):
 
     database, db, _ = None, None, None
+    in_transaction = False
 
     def __init__(self, database):
         self.database = database
 
     def open(self):
-        self.db = connect(self.database)
+        # NOTE: transactions are managed explicitly, see transaction()
+        self.db = connect(self.database, isolation_level=None)
         return self
 
     def close(self):
@@ -57,13 +60,30 @@ class DB(object):
         if self._ is None:
             self.cursor()
         self._.execute(sql, *args)
-        self.commit()
+        if not self.in_transaction:
+            self.commit()
         return self
 
     def commit(self):
         self.db.commit()
         return self
 
+    @contextmanager
+    def transaction(self):
+        if self._ is None:
+            self.cursor()
+        self._.execute("BEGIN IMMEDIATE")
+        self.in_transaction = True
+        try:
+            yield self
+        except:
+            self._.execute("ROLLBACK")
+            raise
+        else:
+            self._.execute("COMMIT")
+        finally:
+            self.in_transaction = False
+
     def reset(self):
         self.query("SELECT name, type FROM sqlite_master WHERE type IS 'table'")
         sql = "DROP TABLE IF EXISTS {table}"
@@ -84,6 +104,38 @@ class DB(object):
         self.query(query, row_values)
         return self._.lastrowid
 
+    def upsert_many(self, table_name, rows):
+        rows = list(rows)
+        if not rows:
+            return 0
+        sql = "INSERT OR REPLACE INTO {table} VALUES ({values})"
+        values = ["?" for _ in rows[0]]
+        query = sql.format(table=table_name, values=",".join(values))
+        if self._ is None:
+            self.cursor()
+        self._.executemany(query, rows)
+        if not self.in_transaction:
+            self.commit()
+        return len(rows)
+
+    def delete_many(self, table_name, fields, rows):
+        rows = list(rows)
+        if not rows:
+            return 0
+        sql = "DELETE FROM {table} WHERE {where}"
+        where = " AND ".join("{}=?".format(f) for f in fields)
+        query = sql.format(table=table_name, where=where)
+        if self._ is None:
+            self.cursor()
+        self._.executemany(query, rows)
+        if not self.in_transaction:
+            self.commit()
+        return len(rows)
+
+    def tables(self):
+        self.query("SELECT name FROM sqlite_master WHERE type IS 'table'")
+        return {name for name, in self._.fetchall()}
+
     def select(self, table_name, *fields):
         sql = "SELECT {fields} FROM {table}"
         query = sql.format(table=table_name, fields=",".join(fields))
@@ -99,37 +151,63 @@ class DB(object):
 
 class Schema(DB):
 
-    def load_events(self):
+    RESOURCES = ("events", "drivers", "system_ssl", "startup_javascript", "browsers")
+
+    def open(self):
+        super(Schema, self).open()
+        self.db.execute("PRAGMA query_only = ON")
+        return self
+
+    def load(self, resource):
+        self.open().cursor()
+        try:
+            return getattr(self, "read_{}".format(resource))()
+        finally:
+            self.close()
+
+    def load_resources(self):
         self.open().cursor()
+        try:
+            return {k:getattr(self, "read_{}".format(k))() for k in self.RESOURCES}
+        finally:
+            self.close()
+
+    def load_events(self):
+        return self.load("events")
+
+    def load_drivers(self):
+        return self.load("drivers")
+
+    def load_system_ssl(self):
+        return self.load("system_ssl")
+
+    def load_startup_javascript(self):
+        return self.load("startup_javascript")
+
+    def load_browsers(self):
+        return self.load("browsers")
+
+    def read_events(self):
         gt, st = "getter", "setter"
         fields = ["event", "getter", "setter"]
         rows = self.select("events", *fields)
-        self.close()
         return {e:{gt:g, st:s} for e, g, s in rows}
 
-    def load_drivers(self):
-        self.open().cursor()
+    def read_drivers(self):
         bk, dk = "browser", "driver"
         fields = ["name", "browser", "browser_bin", "driver", "driver_bin"]
         rows = self.select("drivers", *fields)
-        self.close()
         return {e:{bk:(b,bb), dk:(d,db)} for e, b, bb, d, db in rows}
 
-    def load_system_ssl(self):
-        self.open().cursor()
+    def read_system_ssl(self):
         rows = self.filter("system", r"key like 'ssl_%'", "key", "value")
-        self.close()
         return {k.replace("ssl_", ""):v for k, v in rows}
 
-    def load_startup_javascript(self):
-        self.open().cursor()
+    def read_startup_javascript(self):
         rows = self.filter("javascript", r"key='startup'", "key", "value")
-        self.close()
         results = {k:v for k, v in rows}
         return results.get("startup", "")
 
-    def load_browsers(self):
-        self.open().cursor()
+    def read_browsers(self):
         rows = self.select("browsers", "browser", "args")
-        self.close()
         return {br:args for br, args in rows}
@@ -0,0 +1,117 @@
+# Copyright 2017 Alexandru Catrina
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Pool of X virtual framebuffers kept alive between tasks.
+
+A display is leased to one task at a time and DISPLAY points to it for the
+duration of the lease. Idle displays are kept per resolution up to
+MAX_DISPLAYS; crashed displays are restarted on the next lease. Display
+numbers come from xvfbwrapper lock files, so pools in concurrent processes
+never collide.
+"""
+
+from os import environ
+from contextlib import contextmanager
+
+from nova import Nova
+
+
+class DisplayPool(object):
+
+    MAX_DISPLAYS = 2
+
+    def __init__(self, max_displays=None, log=None):
+        self.idle, self.leased = [], set()
+        self.started, self.restarted = 0, 0
+        if max_displays is not None:
+            self.MAX_DISPLAYS = int(max_displays)
+        if log is not None:
+            self.log = log
+
+    def log(self, message):
+        pass
+
+    @classmethod
+    def key(cls, params):
+        return tuple(sorted((k, int(v)) for k, v in params.iteritems()))
+
+    @classmethod
+    def alive(cls, display):
+        return display.proc is not None and display.proc.poll() is None
+
+    @classmethod
+    def stop(cls, display):
+        current = environ.get("DISPLAY")
+        try:
+            display.stop()
+        finally:
+            if current is not None:
+                environ["DISPLAY"] = current
+            else:
+                environ.pop("DISPLAY", None)
+
+    def start(self, key):
+        params = dict(key)
+        display = Nova.Display.VirtualScreen(**params)
+        display.start()
+        self.started += 1
+        self.log("Started display :{} at {}x{}".format(
+            display.new_display, params.get("width"), params.get("height")))
+        return display
+
+    def acquire(self, params):
+        key = self.key(params)
+        for i, (each, display) in enumerate(self.idle):
+            if each != key:
+                continue
+            del self.idle[i]
+            if self.alive(display):
+                return key, display
+            self.log("Restarting crashed display :{}".format(display.new_display))
+            self.stop(display)
+            self.restarted += 1
+            break
+        return key, self.start(key)
+
+    def release(self, key, display):
+        self.leased.discard(display)
+        if not self.alive(display):
+            self.stop(display)
+            return self
+        self.idle.append((key, display))
+        while len(self.idle) > max(self.MAX_DISPLAYS - len(self.leased), 0):
+            self.stop(self.idle.pop(0)[1])
+        return self
+
+    @contextmanager
+    def lease(self, **params):
+        previous = environ.get("DISPLAY")
+        key, display = self.acquire(params)
+        self.leased.add(display)
+        environ["DISPLAY"] = ":{}".format(display.new_display)
+        try:
+            yield display
+        finally:
+            if previous is not None:
+                environ["DISPLAY"] = previous
+            else:
+                environ.pop("DISPLAY", None)
+            self.release(key, display)
+
+    def close(self):
+        for _, display in self.idle:
+            self.stop(display)
+        self.idle = []
+        return self
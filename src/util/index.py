@@ -0,0 +1,133 @@
+# Copyright 2017 Alexandru Catrina
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Sparse offset index for nova scripts.
+
+Every STEP events the index stores a checkpoint:
+    offset      - byte offset of the event in the script
+    ordinal     - event number (header lines are not counted)
+    timestamp   - highest timestamp of every event up to and including
+                  the checkpoint (ms)
+
+Text scripts keep their index in a sidecar file next to the script, built in
+one pass and rebuilt whenever the script size or mtime changes.
+"""
+
+from bisect import bisect_left, bisect_right
+from struct import Struct
+from os import path, rename, remove
+
+
+class Index(object):
+
+    MAGIC = "NVSI"
+    EXTENSION = ".idx"
+    STEP = 256
+    HEADER_LINES = 4
+
+    HEADER = Struct("<4sQQ")
+    ENTRY = Struct("<QQq")
+
+    def __init__(self, entries):
+        self.offsets, self.ordinals, self.timestamps = [], [], []
+        highest = None
+        for offset, ordinal, timestamp in entries:
+            highest = max(highest, timestamp)
+            self.offsets.append(offset)
+            self.ordinals.append(ordinal)
+            self.timestamps.append(highest)
+
+    def find(self, event=None, time=None):
+        if not self.offsets:
+            return None, 0
+        if event is not None:
+            i = bisect_right(self.ordinals, event) - 1
+        elif time is not None:
+            i = bisect_left(self.timestamps, time) - 1
+        else:
+            i = 0
+        i = max(i, 0)
+        return self.offsets[i], self.ordinals[i]
+
+    def save(self, filename, signature):
+        tempfile = "{}.{}".format(filename, id(self))
+        try:
+            with open(tempfile, "wb") as index:
+                index.write(self.HEADER.pack(self.MAGIC, *signature))
+                for entry in zip(self.offsets, self.ordinals, self.timestamps):
+                    index.write(self.ENTRY.pack(*entry))
+            rename(tempfile, filename)
+        except (IOError, OSError):
+            if path.exists(tempfile):
+                remove(tempfile)
+            return False
+        return True
+
+    @classmethod
+    def signature(cls, filename):
+        return path.getsize(filename), int(path.getmtime(filename))
+
+    @classmethod
+    def sidecar(cls, filename):
+        return filename + cls.EXTENSION
+
+    @classmethod
+    def load(cls, filename, signature):
+        try:
+            with open(filename, "rb") as index:
+                magic, size, mtime = cls.HEADER.unpack(index.read(cls.HEADER.size))
+                if magic != cls.MAGIC or (size, mtime) != signature:
+                    return None
+                data = index.read()
+        except (IOError, OSError):
+            return None
+        size = cls.ENTRY.size
+        return cls(cls.ENTRY.unpack_from(data, i)
+                   for i in xrange(0, len(data) - size + 1, size))
+
+    @classmethod
+    def timestamp(cls, line, sep=","):
+        try:
+            return int(line.split(sep, 2)[1])
+        except Exception:
+            return None
+
+    @classmethod
+    def build(cls, script):
+        entries, offset, ordinal, headers, highest = [], 0, 0, 0, None
+        for line in script:
+            size = len(line)
+            if headers < cls.HEADER_LINES:
+                headers += 1
+            elif line.strip():
+                highest = max(highest, cls.timestamp(line))
+                if ordinal % cls.STEP == 0:
+                    entries.append((offset, ordinal, highest or 0))
+                ordinal += 1
+            offset += size
+        return cls(entries)
+
+    @classmethod
+    def open(cls, filename, opener=None):
+        if opener is None:
+            opener = lambda: open(filename, "rb")
+        sidecar = cls.sidecar(filename)
+        signature = cls.signature(filename)
+        index = cls.load(sidecar, signature)
+        if index is None:
+            with opener() as script:
+                index = cls.build(script)
+            index.save(sidecar, signature)
+        return index
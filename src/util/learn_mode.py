@@ -60,21 +60,29 @@ class LearnMode(Nova.Mode):
 
     def prepare_javascript(self):
         options = {
-            "read_cached": not self.shell.rebuild_cache,
             "disable_ui": self.shell.disable_ui,
-            "minify": self.shell.minify_ui
+            "minify": self.shell.minify_ui,
+            "events": Events.EVENTS
         }
-        if JS.read_script(**options):
+        # NOTE: the cache is only written once events are added
+        if not self.shell.rebuild_cache and JS.read_script(**options):
             self.log.info("Reading scripts from cache...")
+            self.log.info("Injection script: {} bytes".format(len(JS.script)))
         else:
             options.update({"read_cached": False})
             JS.add_events({k:v for k, v in Events.builder(Schema)})
             JS.read_script(**options)
             self.log.info("Reading generated scripts. Caching now...")
+            self.log.info("Injection script: {1} bytes ({0} bytes before "
+                          "minification)".format(*JS.SIZES))
         return self
 
     def prepare_server(self):
+        WebSocket.SSL = dict(Nova.SSL)
         WebSocket.set_scripts_path(path=self.shell.session)
+        WebSocket.set_compression(self.shell.compress)
+        if self.shell.compress:
+            self.log.info("Notice: recording compressed sessions")
         certfile = WebSocket.SSL.get("certfile")
         keyfile = WebSocket.SSL.get("keyfile")
         if path_exists(certfile) and path_exists(keyfile):
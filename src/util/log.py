@@ -25,7 +25,9 @@ class Log(object):
         "format": u"%(levelname)8s %(asctime)s - %(message)s"
     }
 
-    def __init__(self, level=None, filename=None):
+    logger, handler = logging, None
+
+    def __init__(self, level=None, filename=None, name=None):
         if filename is not None:
             self.options.update({"filename": filename})
         if level == 1:
@@ -35,13 +37,33 @@ class Log(object):
         else:
             level = logging.WARNING
         self.options.update({"level": level})
-        logging.basicConfig(**self.options)
+        if name is None:
+            logging.basicConfig(**self.options)
+        else:
+            self.dedicated(name, level, filename)
+
+    def dedicated(self, name, level, filename):
+        self.logger = logging.getLogger(name)
+        self.logger.propagate = False
+        self.logger.setLevel(level)
+        if filename is None:
+            self.handler = logging.StreamHandler()
+        else:
+            self.handler = logging.FileHandler(filename)
+        self.handler.setFormatter(logging.Formatter(self.options.get("format")))
+        self.logger.addHandler(self.handler)
+
+    def close(self):
+        if self.handler is not None:
+            self.logger.removeHandler(self.handler)
+            self.handler.close()
+            self.handler = None
 
     def info(self, *args):
-        logging.info(*args)
+        self.logger.info(*args)
 
     def warn(self, *args):
-        logging.warning(*args)
+        self.logger.warning(*args)
 
     def debug(self, *args):
-        logging.debug(*args)
+        self.logger.debug(*args)
@@ -16,6 +16,8 @@
 Nova application wrapper
 """
 
+from os import path
+
 from webdriver import WebDriver
 from tools import nicefy
 
@@ -25,6 +27,7 @@ from core.app import Application
 class Nova(Application):
 
     DATABASE = ".db"
+    SSL = dict(certfile="cert.pem", keyfile="key.pem")
 
     browser, scan = None, None
     browser_pid, browser_path, browser_version = None, None, None
@@ -112,8 +115,6 @@ class Nova(Application):
         print("Detected the following parameters...")
         for flag, value in shell.__dict__.iteritems():
             print("{}: \033[1m{}\033[0m".format(flag.rjust(15, " "), value))
-        if not shell.rebuild_cache and (shell.disable_ui or shell.minify_ui):
-            print("Notice: customizable flags require a one time run with -R")
         print("")
         try:
             raw_input("Press any key to continue...\n")
@@ -156,6 +157,30 @@ class Nova(Application):
                 cls.overview(shell)
         return cls
 
+    @classmethod
+    def batch_mode(cls, shell):
+        if not path.exists(shell.batch):
+            raise SystemExit("Cannot open batch from {}".format(shell.batch))
+        if shell.starturl:
+            raise SystemExit("Cannot set an URL in batch mode. Try -h")
+        if shell.record:
+            raise SystemExit("Cannot record sessions in batch mode. Try -h")
+        if not shell.silent:
+            cls.print_welcome()
+            if shell.review_shell:
+                cls.overview(shell)
+        return cls
+
+    @classmethod
+    def daemon_mode(cls, shell):
+        if shell.starturl:
+            raise SystemExit("Cannot set an URL in daemon mode. Try -h")
+        if shell.record:
+            raise SystemExit("Cannot record sessions in daemon mode. Try -h")
+        if not shell.silent:
+            cls.print_welcome()
+        return cls
+
     @classmethod
     def scan_mode(cls, shell):
         if not shell.silent:
@@ -191,6 +216,24 @@ class Nova(Application):
         except Exception as e:
             raise SystemExit("Cannot open file from {}".format(shell.analyze_file))
 
+    @classmethod
+    def convert_mode(cls, shell):
+        if not shell.silent:
+            cls.print_welcome()
+        try:
+            open(shell.convert_file).close()
+        except Exception as e:
+            raise SystemExit("Cannot open file from {}".format(shell.convert_file))
+
+    @classmethod
+    def optimize_mode(cls, shell):
+        if not shell.silent:
+            cls.print_welcome()
+        try:
+            open(shell.optimize_file).close()
+        except Exception as e:
+            raise SystemExit("Cannot open file from {}".format(shell.optimize_file))
+
     @classmethod
     def interactive_mode(cls, shell):
         if not shell.browser:
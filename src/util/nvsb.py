@@ -0,0 +1,260 @@
+# Copyright 2017 Alexandru Catrina
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Binary nova script (nvsb) encoder and decoder.
+
+File layout:
+    magic       - "NVSB" followed by format version
+    header      - url, start time, user agent and environment strings
+    blocks      - up to BLOCK_SIZE events stored column by column
+    footer      - interned event names, interned data strings, blocks index
+                  (offset, first ordinal, highest timestamp so far)
+    trailer     - footer offset followed by "NVSB"
+
+Block columns:
+    event       - index of event name in names table
+    mask        - bit N is set when schema attribute N is null
+    timeStamp   - delta from previous event timestamp
+    buttons     - mouse button or equivalent
+    clientX     - cursor X position or equivalent
+    clientY     - cursor Y position or equivalent
+    modifiers   - alt, ctrl, shift and meta keys as bits 0 to 3
+    data        - index of event data in data table
+
+Every column is written as an array of the narrowest integer type able to
+hold its values, so decoding a block costs a single read per column.
+"""
+
+from array import array
+from struct import Struct
+from sys import byteorder
+from os import SEEK_END
+from os.path import splitext
+
+from core.schema import Schema
+
+
+class NVSB(object):
+
+    MAGIC, VERSION = "NVSB", "\x01"
+    EXTENSION = ".nvsb"
+    BLOCK_SIZE = 4096
+    HEADER_LINES = 4
+    COLUMNS = 8
+
+    UNSIGNED, SIGNED = "BHI", "bhi"
+
+    SIZE = Struct("<I")
+    BLOCK = Struct("<Iq")
+    INDEX = Struct("<QQq")
+    TRAILER = Struct("<Q4s")
+
+    MODIFIERS = tuple(tuple(bool(m >> i & 1) for i in range(4)) for m in range(16))
+
+    class Encoder(object):
+
+        def __init__(self, output, header):
+            if len(header) != NVSB.HEADER_LINES:
+                raise ValueError("Unexpected nvs header: expecting {} lines"
+                                 .format(NVSB.HEADER_LINES))
+            self.output = output
+            self.names, self.datas = {}, {}
+            self.index, self.pending, self.ordinal = [], [], 0
+            self.highest = None
+            self.output.write(NVSB.MAGIC + NVSB.VERSION)
+            for line in header:
+                NVSB.write_string(self.output, line)
+
+        def intern(self, table, value):
+            index = table.get(value)
+            if index is None:
+                index = table[value] = len(table)
+            return index
+
+        def write(self, values):
+            self.pending.append(values)
+            if len(self.pending) >= NVSB.BLOCK_SIZE:
+                self.flush()
+            return self
+
+        def flush(self):
+            if not self.pending:
+                return self
+            columns = [[] for _ in range(NVSB.COLUMNS)]
+            base, last = None, None
+            for values in self.pending:
+                event, timestamp, buttons, x, y = values[:5]
+                mask, modifiers = 0, 0
+                for i, value in enumerate(values[1:-1]):
+                    if value is None:
+                        mask |= 1 << i
+                for i, value in enumerate(values[5:9]):
+                    if value:
+                        modifiers |= 1 << i
+                if timestamp is None:
+                    delta = 0
+                elif base is None:
+                    base, last, delta = timestamp, timestamp, 0
+                else:
+                    delta, last = timestamp - last, timestamp
+                row = (self.intern(self.names, event), mask, delta,
+                       buttons or 0, x or 0, y or 0, modifiers,
+                       self.intern(self.datas, values[-1]))
+                for column, value in zip(columns, row):
+                    column.append(value)
+            if base is None:
+                base = 0
+            highest = max(self.highest, base)
+            self.highest = max(self.highest, *[v[1] for v in self.pending])
+            self.index.append((self.output.tell(), self.ordinal, highest))
+            self.output.write(NVSB.BLOCK.pack(len(self.pending), base))
+            for column in columns:
+                NVSB.write_column(self.output, column)
+            self.ordinal += len(self.pending)
+            self.pending = []
+            return self
+
+        def close(self):
+            self.flush()
+            footer = self.output.tell()
+            for table in (self.names, self.datas):
+                self.output.write(NVSB.SIZE.pack(len(table)))
+                for value, _ in sorted(table.iteritems(), key=lambda x: x[1]):
+                    NVSB.write_string(self.output, value)
+            self.output.write(NVSB.SIZE.pack(len(self.index)))
+            for entry in self.index:
+                self.output.write(NVSB.INDEX.pack(*entry))
+            self.output.write(NVSB.TRAILER.pack(footer, NVSB.MAGIC))
+            return self.ordinal
+
+    class Decoder(object):
+
+        def __init__(self, script):
+            self.script = script
+            magic = self.script.read(len(NVSB.MAGIC) + len(NVSB.VERSION))
+            if magic != NVSB.MAGIC + NVSB.VERSION:
+                raise ValueError("Unexpected nvsb file: unsupported format")
+            self.header = [NVSB.read_string(self.script)
+                           for _ in range(NVSB.HEADER_LINES)]
+            self.script.seek(-NVSB.TRAILER.size, SEEK_END)
+            footer, magic = NVSB.TRAILER.unpack(self.script.read(NVSB.TRAILER.size))
+            if magic != NVSB.MAGIC:
+                raise ValueError("Unexpected nvsb file: truncated or corrupted")
+            self.script.seek(footer)
+            self.names = NVSB.read_table(self.script)
+            self.datas = NVSB.read_table(self.script)
+            count, = NVSB.SIZE.unpack(self.script.read(NVSB.SIZE.size))
+            size = NVSB.INDEX.size
+            self.index = [NVSB.INDEX.unpack(self.script.read(size))
+                          for _ in range(count)]
+
+        def read_block(self, offset):
+            self.script.seek(offset)
+            count, last = NVSB.BLOCK.unpack(self.script.read(NVSB.BLOCK.size))
+            columns = [NVSB.read_column(self.script, count)
+                       for _ in range(NVSB.COLUMNS)]
+            names, datas = self.names, self.datas
+            modifiers = NVSB.MODIFIERS
+            events = []
+            for n, m, t, b, x, y, k, d in zip(*columns):
+                last += t
+                event = (names[n], last, b, x, y) + modifiers[k] + (datas[d],)
+                if m:
+                    event = list(event)
+                    for i in range(len(Schema.ATTRIBUTES)):
+                        if m >> i & 1:
+                            event[i + 1] = None
+                    event = tuple(event)
+                events.append(event)
+            return events
+
+        def forward(self):
+            for line in self.header:
+                yield line
+            for offset, _, _ in self.index:
+                for event in self.read_block(offset):
+                    yield event
+
+        def seek(self, offset):
+            for block, _, _ in self.index:
+                if block < offset:
+                    continue
+                for event in self.read_block(block):
+                    yield event
+
+        def backward(self):
+            for offset, _, _ in reversed(self.index):
+                for event in reversed(self.read_block(offset)):
+                    yield event
+            for line in reversed(self.header):
+                yield line
+
+    @classmethod
+    def detect(cls, filename):
+        try:
+            with open(filename, "rb") as script:
+                return script.read(len(cls.MAGIC)) == cls.MAGIC
+        except Exception:
+            return False
+
+    @classmethod
+    def target(cls, filename, binary=True):
+        name, ext = splitext(filename)
+        if ext not in (cls.EXTENSION, ".nvs"):
+            name = filename
+        return name + (cls.EXTENSION if binary else ".nvs")
+
+    @classmethod
+    def write_string(cls, output, value):
+        if isinstance(value, unicode):
+            value = value.encode("utf8")
+        output.write(cls.SIZE.pack(len(value)))
+        output.write(value)
+
+    @classmethod
+    def read_string(cls, script):
+        size, = cls.SIZE.unpack(script.read(cls.SIZE.size))
+        return script.read(size)
+
+    @classmethod
+    def read_table(cls, script):
+        count, = cls.SIZE.unpack(script.read(cls.SIZE.size))
+        return [cls.read_string(script) for _ in range(count)]
+
+    @classmethod
+    def write_column(cls, output, values):
+        low, high = min(values), max(values)
+        for code in cls.UNSIGNED if low >= 0 else cls.SIGNED:
+            column = array(code)
+            bits = column.itemsize * 8
+            if code in cls.UNSIGNED and high < 1 << bits:
+                break
+            if code in cls.SIGNED and -(1 << bits - 1) <= low <= high < 1 << bits - 1:
+                break
+        else:
+            raise ValueError("Unexpected value: {} out of range".format(high))
+        column.extend(values)
+        if byteorder == "big":
+            column.byteswap()
+        output.write(code)
+        output.write(column.tostring())
+
+    @classmethod
+    def read_column(cls, script, count):
+        column = array(script.read(1))
+        column.fromstring(script.read(column.itemsize * count))
+        if byteorder == "big":
+            column.byteswap()
+        return column
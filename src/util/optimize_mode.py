@@ -0,0 +1,102 @@
+# Copyright 2017 Alexandru Catrina
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Optimize mode wrapper.
+"""
+
+from os import path
+
+from nova import Nova
+from nvsb import NVSB
+from reader import Reader
+from optimizer import Optimizer
+from tools import open_nvs
+
+from core.schema import Schema
+
+
+class OptimizeMode(Nova.Mode):
+
+    SUFFIX = ".opt"
+
+    source, target, binary = None, None, False
+    optimizer, skipped = None, 0
+
+    def __init__(self, log, shell):
+        self.log = log
+        self.log.info("Launching Nova in optimize mode...")
+        self.source = shell.optimize_file
+        self.binary = NVSB.detect(self.source)
+        self.target = shell.output
+        if self.target is None:
+            self.target = self.suffix(self.source)
+        if path.abspath(self.target) == path.abspath(self.source):
+            raise ValueError("Cannot optimize nvs file over itself")
+        self.optimizer = Optimizer()
+
+    @classmethod
+    def suffix(cls, filename):
+        for ext in (NVSB.EXTENSION, ".gz"):
+            if filename.endswith(ext):
+                return cls.suffix(filename[:-len(ext)]) + ext
+        name, ext = path.splitext(filename)
+        return name + cls.SUFFIX + ext
+
+    def read_actions(self, reader):
+        while not reader.ended():
+            action = reader.read()
+            if action is None:
+                continue
+            if isinstance(action, tuple):
+                yield action
+                continue
+            try:
+                yield Schema.parse(action)
+            except Exception as e:
+                self.log.warn("Skipping event: {}".format(e))
+                self.skipped += 1
+
+    def run(self):
+        reader = Reader(self.source)
+        self.log.info("Optimizing {} to {}...".format(self.source, self.target))
+        header = [reader.read() for _ in range(NVSB.HEADER_LINES)]
+        actions = self.optimizer.filter(self.read_actions(reader))
+        with open_nvs(self.target, "wb", reader.compressed) as output:
+            if self.binary:
+                encoder = NVSB.Encoder(output, header)
+                for action in actions:
+                    encoder.write(action)
+                encoder.close()
+            else:
+                for line in header:
+                    output.write(line + "\n")
+                for action in actions:
+                    output.write(Schema.compose(action) + "\n")
+        return self
+
+    def clean(self):
+        read, removed = self.optimizer.read, self.optimizer.removed
+        self.log.info("Removed {} of {} events ({:.1f}%, {} skipped)".format(
+            removed, read, removed * 100. / (read or 1), self.skipped))
+        return self
+
+
+def optimize_mode(log, shell):
+    Nova.optimize_mode(shell)
+    try:
+        mode = OptimizeMode(log, shell)
+        mode.run().clean()
+    except Exception as e:
+        Nova.error(e)
@@ -0,0 +1,132 @@
+# Copyright 2017 Alexandru Catrina
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Thin visually redundant events out of parsed nova script actions.
+
+    mousemove   - repeated points are dropped and runs of moves with the same
+                  buttons are simplified with Ramer-Douglas-Peucker; a run
+                  ends on any other event or after IDLE ms without moving
+    scroll      - last position wins inside SCROLL_WINDOW ms
+
+Every other event is passed through untouched and no timestamp is changed,
+so the move right before a click always keeps its position and timing.
+"""
+
+from math import hypot
+
+
+class Optimizer(object):
+
+    POINTER, SCROLL = "mousemove", "scroll"
+    TOLERANCE = 2.
+    SCROLL_WINDOW = 100
+    IDLE = 250
+    MAX_RUN = 4096
+
+    read, kept = 0, 0
+
+    def __init__(self, tolerance=None, scroll_window=None):
+        if tolerance is not None:
+            self.TOLERANCE = float(tolerance)
+        if scroll_window is not None:
+            self.SCROLL_WINDOW = int(scroll_window)
+
+    @property
+    def removed(self):
+        return self.read - self.kept
+
+    @classmethod
+    def distance(cls, point, start, end):
+        (x, y), (x1, y1), (x2, y2) = point, start, end
+        dx, dy = x2 - x1, y2 - y1
+        length = hypot(dx, dy)
+        if length == 0:
+            return hypot(x - x1, y - y1)
+        return abs(dy * x - dx * y + x2 * y1 - y2 * x1) / length
+
+    @classmethod
+    def simplify(cls, points, tolerance):
+        keep = [False] * len(points)
+        if not points:
+            return keep
+        keep[0] = keep[-1] = True
+        stack = [(0, len(points) - 1)]
+        while stack:
+            first, last = stack.pop()
+            index, farthest = None, tolerance
+            for i in xrange(first + 1, last):
+                d = cls.distance(points[i], points[first], points[last])
+                if d > farthest:
+                    index, farthest = i, d
+            if index is not None:
+                keep[index] = True
+                stack.append((first, index))
+                stack.append((index, last))
+        return keep
+
+    @classmethod
+    def movable(cls, action):
+        return action[0] == cls.POINTER and None not in action[1:5]
+
+    def thin(self, run):
+        points = [action[3:5] for action in run]
+        for action, keep in zip(run, self.simplify(points, self.TOLERANCE)):
+            if keep:
+                yield action
+
+    def breaks(self, run, action):
+        last = run[-1]
+        return (action[2] != last[2] or action[1] - last[1] > self.IDLE
+                or len(run) >= self.MAX_RUN)
+
+    def filter(self, actions):
+        run, scroll = [], None
+        for action in actions:
+            self.read += 1
+            if self.movable(action):
+                if scroll is not None:
+                    yield self.keep(scroll[0])
+                    scroll = None
+                if run and self.breaks(run, action):
+                    for each in self.thin(run):
+                        yield self.keep(each)
+                    run = []
+                if run and action[3:5] == run[-1][3:5]:
+                    continue
+                run.append(action)
+                continue
+            for each in self.thin(run):
+                yield self.keep(each)
+            run = []
+            if action[0] == self.SCROLL and action[1] is not None:
+                if scroll is None or action[1] - scroll[1] > self.SCROLL_WINDOW:
+                    if scroll is not None:
+                        yield self.keep(scroll[0])
+                    scroll = action, action[1]
+                else:
+                    scroll = action, scroll[1]
+                continue
+            if scroll is not None:
+                yield self.keep(scroll[0])
+                scroll = None
+            yield self.keep(action)
+        for each in self.thin(run):
+            yield self.keep(each)
+        if scroll is not None:
+            yield self.keep(scroll[0])
+
+    def keep(self, action):
+        self.kept += 1
+        return action
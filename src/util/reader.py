@@ -14,25 +14,166 @@
 
 """
 Script reader line by line until EOF.
+
+Lines are streamed from disk on demand so memory usage stays flat no matter
+how large the scenario is. Reverse reading walks the file backwards in fixed
+size blocks instead of loading it.
+
+Binary scripts (nvsb) are detected automatically and their events are read
+as decoded tuples instead of text lines.
+
+Gzip compressed scripts are decompressed on the fly. They can be read
+forwards and seeked, but not read backwards.
+
+Reading can start at any event number or timestamp through a sparse offset
+index, and can stop at another one, without scanning from the top.
 """
 
+from os import SEEK_END
+from itertools import chain, islice
+
+from nvsb import NVSB
+from tools import open_nvs
+from compression import Compression
+from index import Index
+
+from core.schema import Schema
+
+
 class Reader(object):
 
-    data, sep, script, EOF = None, "\n", None, False
+    BUFFER_SIZE = 1 << 16
+
+    filename, sep, script, EOF = None, "\n", None, False
+    binary, compressed, index, ordinal = False, False, None, 0
 
     def __init__(self, filename):
         try:
-            with open(filename) as script:
-                self.data = script.read().strip().split(self.sep)
+            open(filename, "rb").close()
         except Exception as e:
             raise ValueError("Unexpected error while reading script: {}".format(e))
+        self.filename = filename
+        self.binary = NVSB.detect(filename)
+        self.compressed = Compression.detect(filename)
         self.script = self.create_script()
 
+    def open_script(self):
+        return open_nvs(self.filename, "rb", self.compressed, self.BUFFER_SIZE)
+
     def create_script(self, inverse=False):
-        if not isinstance(self.data, list):
-            raise ValueError("Unexpected data type: script must be a list")
-        for line in self.data[-1::-1] if inverse else self.data:
-            yield line
+        if self.filename is None:
+            raise ValueError("Unexpected script: missing filename")
+        if self.binary:
+            return self.read_binary(inverse)
+        return self.read_text(inverse)
+
+    def read_header(self):
+        with self.open_script() as script:
+            header = [script.readline() for _ in range(Index.HEADER_LINES)]
+        return [line for line in header if line]
+
+    def read_text(self, inverse=False, offset=0):
+        # NOTE: only blank lines after the header are skipped
+        if inverse:
+            header = self.read_header()
+            lines = self.read_backward(sum(len(line) for line in header))
+            header = [line.rstrip(self.sep) for line in reversed(header)]
+        else:
+            lines = self.read_forward(offset)
+            header = [] if offset else list(islice(lines, Index.HEADER_LINES))
+        events = (line for line in lines if line.strip())
+        for line in chain(events, header) if inverse else chain(header, events):
+            yield line.rstrip("\r")
+
+    def read_forward(self, offset=0):
+        with self.open_script() as script:
+            script.seek(offset)
+            for line in script:
+                yield line.rstrip(self.sep)
+
+    def read_backward(self, stop=0):
+        if self.compressed:
+            raise ValueError("Cannot read compressed script backwards")
+        with self.open_script() as script:
+            script.seek(0, SEEK_END)
+            position, tail = script.tell(), ""
+            while position > stop:
+                size = min(self.BUFFER_SIZE, position - stop)
+                position -= size
+                script.seek(position)
+                lines = (script.read(size) + tail).split(self.sep)
+                tail = lines.pop(0)
+                for line in reversed(lines):
+                    yield line
+            yield tail
+
+    def read_binary(self, inverse=False, offset=None):
+        with self.open_script() as script:
+            decoder = NVSB.Decoder(script)
+            if offset is not None:
+                events = decoder.seek(offset)
+            elif inverse:
+                events = decoder.backward()
+            else:
+                events = decoder.forward()
+            for event in events:
+                yield event
+
+    def create_index(self):
+        if self.index is not None:
+            return self.index
+        if self.binary:
+            with self.open_script() as script:
+                self.index = Index(NVSB.Decoder(script).index)
+        else:
+            self.index = Index.open(self.filename, self.open_script)
+        return self.index
+
+    def timestamp(self, action):
+        if isinstance(action, tuple):
+            return action[1]
+        return Index.timestamp(action, Schema.separator)
+
+    def seek(self, event=None, time=None):
+        offset, self.ordinal = self.create_index().find(event=event, time=time)
+        if offset is None:
+            self.script = iter(())
+            return self
+        if self.binary:
+            actions = self.read_binary(offset=offset)
+        else:
+            actions = self.read_text(offset=offset)
+        for action in actions:
+            if event is not None and self.ordinal < event:
+                self.ordinal += 1
+                continue
+            if time is not None:
+                timestamp = self.timestamp(action)
+                if timestamp is not None and timestamp < time:
+                    self.ordinal += 1
+                    continue
+            self.script = chain([action], actions)
+            break
+        else:
+            self.script = iter(())
+        self.EOF = False
+        return self
+
+    def until(self, event=None, time=None):
+        self.script = self.read_until(self.script, event, time)
+        return self
+
+    def read_until(self, script, event=None, time=None):
+        ordinal = self.ordinal
+        for action in script:
+            if event is not None and ordinal >= event:
+                break
+            if time is not None:
+                timestamp = self.timestamp(action)
+                if timestamp is not None and timestamp > time:
+                    break
+            ordinal += 1
+            yield action
 
     def read(self):
         try:
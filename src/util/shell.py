@@ -56,6 +56,25 @@ class Shell(object):
                 "dest": "interactive",
                 "help": "run an interactive session"
             },
+            ("convert-file", "c"): {
+                "action": "store",
+                "dest": "convert_file",
+                "help": "convert nvs file to binary nvsb format or back"
+            },
+            ("batch", "b"): {
+                "action": "store",
+                "dest": "batch",
+                "help": "run all nvs files from a directory or manifest (batch mode)"
+            },
+            ("daemon", "d"): {
+                "action": "store_true",
+                "help": "keep nova resident and run jobs received over a unix socket"
+            },
+            ("optimize-file", "o"): {
+                "action": "store",
+                "dest": "optimize_file",
+                "help": "thin redundant mousemove and scroll events from nvs file"
+            },
         }
     )
 
@@ -76,8 +95,12 @@ class Shell(object):
             "help": "set a starting url to open"
         },
         ("headless", None): {
-            "action": "store_true",
-            "help": "run browser headless"
+            "action": "store",
+            "nargs": "?",
+            "const": "xvfb",
+            "choices": ("xvfb", "native"),
+            "help": "run browser headless in an X virtual framebuffer (default) "
+                    "or with the browser native headless mode"
         },
         ("verbose", "v"): {
             "action": "count",
@@ -128,6 +151,73 @@ class Shell(object):
             "dest": "merge_session",
             "help": "merge nvs files into one final nvs file"
         },
+        ("start-at", None): {
+            "action": "store",
+            "dest": "start_at",
+            "help": "start task or analysis at event number N or time T (e.g. 300s)"
+        },
+        ("stop-at", None): {
+            "action": "store",
+            "dest": "stop_at",
+            "help": "stop task or analysis at event number N or time T (e.g. 600s)"
+        },
+        ("speed", None): {
+            "action": "store",
+            "dest": "speed",
+            "help": "replay speed factor (e.g. 4) or 'max' to run as fast as the page allows"
+        },
+        ("max-idle", None): {
+            "action": "store",
+            "dest": "max_idle",
+            "help": "cap replay pauses longer than given seconds"
+        },
+        ("coalesce", None): {
+            "action": "store",
+            "dest": "coalesce",
+            "help": "run replay events due within given ms in one browser call"
+        },
+        ("optimize", None): {
+            "action": "store_true",
+            "help": "thin redundant mousemove and scroll events before replay"
+        },
+        ("jobs", "j"): {
+            "action": "store",
+            "dest": "jobs",
+            "help": "number of concurrent tasks in batch mode (default: cpu count)"
+        },
+        ("recycle", None): {
+            "action": "store",
+            "dest": "recycle",
+            "help": "restart pooled browsers after N tasks in batch mode (default: 20)"
+        },
+        ("displays", None): {
+            "action": "store",
+            "dest": "displays",
+            "help": "virtual displays kept alive per batch worker (default: 2)"
+        },
+        ("socket", None): {
+            "action": "store",
+            "dest": "socket",
+            "help": "unix socket of nova daemon (default: /tmp/nova/nova.sock)"
+        },
+        ("connect", None): {
+            "action": "store_true",
+            "help": "submit task, analysis or scan to a running nova daemon"
+        },
+        ("in-page", None): {
+            "action": "store_true",
+            "dest": "in_page",
+            "help": "schedule replay events with an in-page player"
+        },
+        ("output", None): {
+            "action": "store",
+            "dest": "output",
+            "help": "set output file path"
+        },
+        ("compress", None): {
+            "action": "store_true",
+            "help": "record gzip compressed nvs sessions"
+        },
         ("logfile", None): {
             "action": "store",
             "dest": "logfile",
@@ -0,0 +1,106 @@
+# Copyright 2017 Alexandru Catrina
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compiled snapshot of database resources.
+
+The snapshot is a marshal blob stored next to the database and loaded in
+one read. It holds every resource table plus prebuilt event metadata. It is
+only accepted for the same format version and schema fields, and is keyed
+by the database size, mtime and SQLite file change counter; when those
+change, a content digest decides whether the snapshot is still valid before
+the database is read.
+"""
+
+from os import path, rename, remove, getpid
+from marshal import dumps, loads
+from hashlib import sha1
+
+
+class Snapshot(object):
+
+    MAGIC = "NVSR"
+    VERSION = 2  # NOTE: bump when the metadata or template format changes
+    EXTENSION = ".snapshot"
+    CHUNK_SIZE = 1 << 16
+    COUNTER = 24  # NOTE: offset of the file change counter in SQLite header
+
+    @classmethod
+    def sidecar(cls, filename):
+        return filename + cls.EXTENSION
+
+    @classmethod
+    def signature(cls, filename):
+        with open(filename, "rb") as db:
+            db.seek(cls.COUNTER)
+            counter = db.read(4)
+        return path.getsize(filename), path.getmtime(filename), counter
+
+    @classmethod
+    def digest(cls, filename):
+        content = sha1()
+        with open(filename, "rb") as db:
+            for chunk in iter(lambda: db.read(cls.CHUNK_SIZE), ""):
+                content.update(chunk)
+        return content.hexdigest()
+
+    @classmethod
+    def key(cls, schema):
+        return cls.VERSION, schema.fields()
+
+    @classmethod
+    def load(cls, filename, schema):
+        try:
+            with open(cls.sidecar(filename), "rb") as snapshot:
+                if snapshot.read(len(cls.MAGIC)) != cls.MAGIC:
+                    return None
+                data = loads(snapshot.read())
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            return None
+        if not isinstance(data, dict) or data.get("key") != cls.key(schema):
+            return None
+        signature = cls.signature(filename)
+        if data.get("signature") == signature:
+            return data
+        if data.get("digest") != cls.digest(filename):
+            return None
+        data["signature"] = signature
+        cls.write(filename, data)
+        return data
+
+    @classmethod
+    def save(cls, filename, schema, resources, metadata):
+        data = dict(resources)
+        data.update({
+            "key": cls.key(schema),
+            "signature": cls.signature(filename),
+            "digest": cls.digest(filename),
+            "metadata": metadata,
+        })
+        cls.write(filename, data)
+        return data
+
+    @classmethod
+    def write(cls, filename, data):
+        sidecar = cls.sidecar(filename)
+        tempfile = "{}.{}".format(sidecar, getpid())
+        try:
+            with open(tempfile, "wb") as snapshot:
+                snapshot.write(cls.MAGIC + dumps(data))
+            rename(tempfile, sidecar)
+        except (IOError, OSError, ValueError):
+            if path.exists(tempfile):
+                remove(tempfile)
+            return False
+        return True
@@ -21,11 +21,13 @@ from sys import exc_info
 from urllib2 import urlopen, HTTPError, URLError
 from datetime import datetime
 from urlparse import urlparse
-from os import path, makedirs, environ, remove
+from os import path, makedirs, environ, remove, rename
 from time import time, ctime
 from re import sub
+from itertools import islice
 
 from consts import MIN_VALID_NVS, NOVA_DEBUG, NOVA_DB, NOVA_TMP
+from compression import Compression
 
 
 def nicefy(func, *args, **kwargs):
@@ -99,15 +101,35 @@ def save_html(data, url, root_dir=None):
     return save_data(data.encode('utf8'), url, "html", root_dir)
 
 
-def create_nvs_file(dirpath, page, root_dir=None):
-    return save_file(page, "nvs", dirpath, u"", root_dir)
+def create_nvs_file(dirpath, page, root_dir=None, compress=False):
+    filetype = "nvs" + Compression.EXTENSION if compress else "nvs"
+    return save_file(page, filetype, dirpath, u"", root_dir)
 
 
-def update_nvs_session(message, filename, filepath):
+def open_nvs(filename, mode="rb", compress=None, buffer_size=-1):
+    if compress is None:
+        compress = "r" in mode and Compression.detect(filename)
+    if not compress:
+        return open(filename, mode, buffer_size)
+    if "r" in mode:
+        return Compression.reader(filename, buffer_size if buffer_size > 0 else None)
+    return Compression.writer(filename, mode)
+
+
+def open_nvs_session(filename, filepath):
+    return open_nvs(r"{}/{}".format(filepath, filename), "ab", compress=True)
+
+
+def update_nvs_session(message, filename, filepath, stream=None):
     if message is None:
         raise ValueError(r"Unexpected non-string value")
     message += "\n"
-    return save_as(message, filename, filepath, mode="a")
+    if stream is None:
+        return save_as(message, filename, filepath, mode="a")
+    if isinstance(message, unicode):
+        message = message.encode("utf8")
+    stream.write(message)
+    return filename, filepath
 
 
 def path_exists(filepath):
@@ -154,6 +176,20 @@ def timestamp_date(ts, div=1000.):
     raise ValueError("Avoiding an invalid division")
 
 
+def parse_position(position):
+    if position is None:
+        return None, None
+    position = str(position).strip().lower()
+    try:
+        if position.endswith("ms"):
+            return None, int(float(position[:-2]))
+        if position.endswith("s"):
+            return None, int(float(position[:-1]) * 1000)
+        return int(position), None
+    except ValueError:
+        raise ValueError("Unexpected position: expecting event number or time (e.g. 300s)")
+
+
 def lock_session():
     return "{}/session_{}.lock".format(NOVA_TMP, time())
 
@@ -164,34 +200,41 @@ def read_session(session):
     return []
 
 
+def read_nvs(nvs_file):
+    with open_nvs(nvs_file) as nvs:
+        for line in nvs:
+            line = line.rstrip("\r\n")
+            if line:
+                yield line
+
+
 def merge_session(nvs_session_lock, delete_sessions=True):
     if not path_exists(nvs_session_lock):
         return None
-    def last_time(session):
-        last_event = session[-1]
+    def event_time(event, default=0):
         try:
-            ev = last_event.split(",")
-            last_timestamp = int(ev[1])
+            return int(event.split(",")[1])
         except:
-            last_timestamp = 0
-        return last_timestamp
+            return default
     sessions = read_session(nvs_session_lock)
     nvs_file = sessions.pop(0)
-    first_ses = read_session(nvs_file)
-    last_timestamp = last_time(first_ses)
-    nvs = "\n".join(first_ses)
-    for s in sessions:
-        ses, ts = [], last_timestamp
-        for event in read_session(s)[4:]:
-            ev = event.split(",")
-            ts = int(ev[1]) + last_timestamp
-            ev[1] = str(ts)
-            ses.append(",".join(ev))
-        last_timestamp = ts
-        if len(ses) > 0:
-            nvs += "\n" + "\n".join(ses)
-    with open(nvs_file, "w") as file_:
-        file_.write(nvs)
+    merged_file = "{}.merge".format(nvs_file)
+    compress = Compression.detect(nvs_file)
+    with open_nvs(merged_file, "wb", compress) as nvs:
+        last_event = None
+        for event in read_nvs(nvs_file):
+            nvs.write(event + "\n")
+            last_event = event
+        last_timestamp = event_time(last_event)
+        for s in sessions:
+            ts = last_timestamp
+            for event in islice(read_nvs(s), 4, None):
+                ev = event.split(",")
+                ts = int(ev[1]) + last_timestamp
+                ev[1] = str(ts)
+                nvs.write(",".join(ev) + "\n")
+            last_timestamp = ts
+    rename(merged_file, nvs_file)
     if delete_sessions:
         remove(nvs_session_lock)
         [remove(s) for s in sessions if path_exists(s)]
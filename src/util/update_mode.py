@@ -14,12 +14,31 @@
 
 """
 Update mode wrapper.
+
+The update package is fully read and validated before any database is
+touched. Every row is hashed (or takes its hash from the optional package
+manifest.json) and compared with the hashes recorded by previous updates,
+so only inserted, changed and deleted rows are applied. Changes are made
+within a single transaction on a shadow copy of the live database, which
+is swapped in with an atomic rename: running processes keep reading the
+previous file and new ones only ever see a complete resource set.
+
+Sample manifest.json:
+
+    {
+        "version": "190817",
+        "hashes": {"events": {"click": "5d41402abc4b2a76b9719d911017c592"}}
+    }
+
 """
 
 from __future__ import print_function
 
+from os import path, remove, rename, getpid
+from shutil import copyfile
+from hashlib import sha1
 from zipfile import ZipFile
-from json import loads
+from json import loads, dumps
 
 from db import DB
 from nova import Nova
@@ -29,14 +48,27 @@ class UpdateMode(Nova.Mode):
 
     VALID_FILES = ("events.json", "browsers.json", "drivers.json",
                    "system.json", "javascript.json")
+    FIELDS = {
+        "events": ("getter", "setter"),
+        "drivers": ("browser", "driver"),
+        "browsers": ("args", "engine", "download"),
+    }
+    PAIRS = {"drivers": ("browser", "driver")}
+    KEYS = {"events": "event", "drivers": "name", "browsers": "browser",
+            "system": "key", "javascript": "key"}
+    MANIFEST = "manifest.json"
+    HASHES = "hashes"
+    VERSION = "package_version"
 
-    db, data, zip_ = None, None, None
+    db, data, zip_, shadow = None, None, None, None
+    manifest, hashes, changes = None, None, None
 
     def __init__(self, log, shell):
         self.log = log
         self.log.info("Starting...")
         self.shell = shell
-        self.db = DB(Nova.DATABASE)
+        self.shadow = "{}.{}.update".format(Nova.DATABASE, getpid())
+        self.db = DB(self.shadow)
 
     def read_zip(self):
         self.zip_ = ZipFile(self.shell.update_system, r"r")
@@ -49,13 +81,100 @@ class UpdateMode(Nova.Mode):
         return filename.replace(".json", "")
 
     def validate_content(self):
-        return {f for f in self.zip_.namelist() if f in self.VALID_FILES}
+        content = set(self.zip_.namelist())
+        missing = [f for f in self.VALID_FILES if f not in content]
+        if missing:
+            raise ValueError("Missing from update: {}".format(", ".join(missing)))
+        corrupted = self.zip_.testzip()
+        if corrupted is not None:
+            raise ValueError("Corrupted file in update: {}".format(corrupted))
+        return self.VALID_FILES
+
+    def validate_data(self, table, data):
+        if not isinstance(data, dict):
+            raise ValueError("Unexpected '{}' data: expected object".format(table))
+        fields, pairs = self.FIELDS.get(table, ()), self.PAIRS.get(table, ())
+        for key, value in data.iteritems():
+            if not fields:
+                if not isinstance(value, basestring):
+                    raise ValueError("Unexpected '{}' value for '{}'".format(table, key))
+                continue
+            if not isinstance(value, dict) or any(f not in value for f in fields):
+                raise ValueError("Unexpected '{}' row '{}': expected {}".format(
+                    table, key, ", ".join(fields)))
+            if any(len(value[f]) != 2 for f in pairs):
+                raise ValueError("Unexpected '{}' row '{}': expected (name, bin) "
+                                 "for {}".format(table, key, ", ".join(pairs)))
+        return data
+
+    def read_manifest(self):
+        manifest = {}
+        if self.MANIFEST in self.zip_.namelist():
+            manifest = self.from_json(self.MANIFEST)
+        if not isinstance(manifest, dict):
+            raise ValueError("Unexpected manifest: expected object")
+        version = manifest.get("version")
+        if version is None:
+            version = path.splitext(path.basename(self.shell.update_system))[0]
+        manifest["version"] = str(version)
+        return manifest
 
     def prepare_data(self):
         content = self.read_zip().validate_content()
         self.data = {self.from_file(d):self.from_json(d) for d in content}
+        for table, data in self.data.iteritems():
+            self.validate_data(table, data)
+        self.manifest = self.read_manifest()
+        self.data["system"][self.VERSION] = self.manifest["version"]
+        return self
+
+    def row_hash(self, value):
+        return sha1(dumps(value, sort_keys=True)).hexdigest()
+
+    def prepare_hashes(self):
+        given = self.manifest.get("hashes") or {}
+        self.hashes = {}
+        for table, data in self.data.iteritems():
+            hashes = given.get(table) or {}
+            self.hashes[table] = {k:hashes.get(k) or self.row_hash(v)
+                                  for k, v in data.iteritems()}
+        return self
+
+    def read_changes(self, db):
+        tables = db.tables()
+        applied = {}
+        if self.HASHES in tables:
+            for table, key, value in db.select(self.HASHES, "tbl", "key", "hash"):
+                applied.setdefault(table, {})[key] = value
+        self.changes = {}
+        for table, hashes in self.hashes.iteritems():
+            current = applied.get(table, {})
+            keys = set()
+            if table in tables:
+                keys = {k for k, in db.select(table, self.KEYS[table])}
+            changed = {k for k, v in hashes.iteritems()
+                       if k not in keys or current.get(k) != v}
+            deleted = keys.difference(hashes)
+            if changed or deleted:
+                self.changes[table] = (changed, deleted)
         return self
 
+    def prepare_changes(self):
+        self.prepare_hashes()
+        if not path.exists(Nova.DATABASE):
+            self.changes = {t:(set(h), set()) for t, h in self.hashes.iteritems()}
+            return self
+        live = DB(Nova.DATABASE).open()
+        try:
+            self.read_changes(live)
+        finally:
+            live.close()
+        return self
+
+    def changed(self, table):
+        changed, _ = self.changes.get(table, ((), ()))
+        return ((k, self.data[table][k]) for k in changed)
+
     def create_events_table(self):
         self.log.info("Checking 'events' table...")
         self.db.create_table("events", ("event TEXT PRIMARY KEY",
@@ -88,70 +207,80 @@ class UpdateMode(Nova.Mode):
             ("key TEXT PRIMARY KEY", "value TEXT NOT NULL"))
         return self
 
-    def update_events_table(self):
-        for name, data in self.data.get("events").iteritems():
-            getter = data.pop("getter")
-            setter = data.pop("setter")
-            try:
-                self.db.upsert("events", (name, getter, setter))
-                self.log.info("Updating 'events' table with '{}'...".format(name))
-            except Exception as e:
-                self.log.info("Skiping '{}' because: {}".format(name, e))
+    def create_hashes_table(self):
+        self.db.create_table(self.HASHES, ("tbl TEXT NOT NULL",
+            "key TEXT NOT NULL", "hash TEXT NOT NULL", "PRIMARY KEY (tbl, key)"))
         return self
 
+    def update_events_table(self):
+        rows = ((name, data["getter"], data["setter"])
+                for name, data in self.changed("events"))
+        return self.update_table("events", rows)
+
     def update_drivers_table(self):
-        for name, data in self.data.get("drivers").iteritems():
-            br, br_bin = data.pop("browser")
-            dv, dv_bin = data.pop("driver")
-            try:
-                self.db.upsert("drivers", (name, br, br_bin, dv, dv_bin))
-                self.log.info("Updating 'drivers' table with '{}'...".format(name))
-            except Exception as e:
-                self.log.info("Skiping '{}' because: {}".format(name, e))
-        return self
+        rows = ((name,) + tuple(data["browser"]) + tuple(data["driver"])
+                for name, data in self.changed("drivers"))
+        return self.update_table("drivers", rows)
 
     def update_browsers_table(self):
-        for browser, data in self.data.get("browsers").iteritems():
-            args = data.pop("args")
-            engine = data.pop("engine")
-            download = data.pop("download")
-            try:
-                self.db.upsert("browsers", (browser, args, engine, download))
-                self.log.info("Updating 'browsers' table with '{}'...".format(browser))
-            except Exception as e:
-                self.log.info("Skiping '{}' because: {}".format(browser, e))
-        return self
+        rows = ((browser, data["args"], data["engine"], data["download"])
+                for browser, data in self.changed("browsers"))
+        return self.update_table("browsers", rows)
 
     def update_system_table(self):
-        for key, val in self.data.get("system").iteritems():
-            try:
-                self.db.upsert("system", (key, val))
-                self.log.info("Updating 'system' table with '{}'='{}'".format(key, val))
-            except Exception as e:
-                self.log.info("Skiping '{}' because: {}".format(key, e))
-        return self
+        return self.update_table("system", self.changed("system"))
 
     def update_javascript_table(self):
-        for key, val in self.data.get("javascript").iteritems():
-            try:
-                self.db.upsert("javascript", (key, val))
-                self.log.info("Updating 'javascript' table with '{}'='{}'".format(key, val))
-            except Exception as e:
-                self.log.info("Skiping '{}' because: {}".format(key, e))
+        return self.update_table("javascript", self.changed("javascript"))
+
+    def update_table(self, table, rows):
+        changed, deleted = self.changes.get(table, ((), ()))
+        hashes = self.hashes[table]
+        self.db.delete_many(table, (self.KEYS[table],), ((k,) for k in deleted))
+        self.db.upsert_many(table, rows)
+        self.db.delete_many(self.HASHES, ("tbl", "key"), ((table, k) for k in deleted))
+        self.db.upsert_many(self.HASHES, ((table, k, hashes[k]) for k in changed))
+        self.log.info("Updating '{}' table: {} changed, {} deleted...".format(
+            table, len(changed), len(deleted)))
         return self
 
-    def run(self):
+    def build(self):
+        if path.exists(self.shadow):
+            remove(self.shadow)
+        if path.exists(Nova.DATABASE):
+            copyfile(Nova.DATABASE, self.shadow)
         self.db.open().cursor()
-        self.db.reset()
-        self.prepare_data()
-        self.create_system_table().update_system_table()
-        self.create_events_table().update_events_table()
-        self.create_drivers_table().update_drivers_table()
-        self.create_javascript_table().update_javascript_table()
-        self.create_browsers_table().update_browsers_table()
+        try:
+            with self.db.transaction():
+                self.create_hashes_table()
+                self.create_system_table().update_system_table()
+                self.create_events_table().update_events_table()
+                self.create_drivers_table().update_drivers_table()
+                self.create_javascript_table().update_javascript_table()
+                self.create_browsers_table().update_browsers_table()
+        finally:
+            self.db.close()
+        return self
+
+    def swap(self):
+        self.log.info("Swapping database...")
+        rename(self.shadow, Nova.DATABASE)
+        return self
+
+    def run(self):
+        self.prepare_data().prepare_changes()
+        if not self.changes:
+            self.log.info("Package {} already applied, nothing to update".format(
+                self.manifest["version"]))
+            return
+        try:
+            self.build().swap()
+        except:
+            if path.exists(self.shadow):
+                remove(self.shadow)
+            raise
 
     def clean(self):
-        self.db.close()
         self.log.info("Successfully updated")
 
 
@@ -33,13 +33,13 @@ from __future__ import print_function
 
 from tools import get_db_dir, get_db_meta
 from nova import Nova
-from db import Schema
 from webdriver import WebDriver
-from websocket import WebSocket
 from capabilities import Capabilities
+from snapshot import Snapshot
 
 from core.events import Events
 from core.javascript import JS
+from core.schema import Schema as EventSchema
 
 
 class Updater(Nova.Updater):
@@ -49,23 +49,37 @@ class Updater(Nova.Updater):
 
     def __init__(self, db):
         self.events = Events.EVENTS
+        self.metadata = Events.METADATA
         self.drivers = WebDriver.DRIVERS
-        self.ssl = WebSocket.SSL
+        self.ssl = Nova.SSL
         self.js_script = JS.ON_STARTUP
         self.capabilities = Capabilities.BROWSERS
-        self.db = Schema(db)
+        self.dbfile = db
+
+    def resources(self):
+        snapshot = Snapshot.load(self.dbfile, EventSchema)
+        if snapshot is not None:
+            self.log("Loaded resources from snapshot...")
+            return snapshot
+        from db import Schema
+        resources = Schema(self.dbfile).load_resources()
+        metadata = Events.metadata(EventSchema, resources.get("events"))
+        return Snapshot.save(self.dbfile, EventSchema, resources, metadata)
 
     def commit(self):
-        Events.EVENTS = self.db.load_events()
-        WebDriver.DRIVERS = self.db.load_drivers()
-        WebSocket.SSL = self.db.load_system_ssl()
-        JS.ON_STARTUP = self.db.load_startup_javascript()
-        Capabilities.BROWSERS = self.db.load_browsers()
+        resources = self.resources()
+        Events.EVENTS = resources["events"]
+        Events.METADATA = resources["metadata"]
+        WebDriver.DRIVERS = resources["drivers"]
+        Nova.SSL = resources["system_ssl"]
+        JS.ON_STARTUP = resources["startup_javascript"]
+        Capabilities.BROWSERS = resources["browsers"]
 
     def rollback(self):
         Events.EVENTS = self.events
+        Events.METADATA = self.metadata
         WebDriver.DRIVERS = self.drivers
-        WebSocket.SSL = self.ssl
+        Nova.SSL = self.ssl
         JS.ON_STARTUP = self.js_script
         Capabilities.BROWSERS = self.capabilities
 
@@ -97,7 +111,7 @@ class Updater(Nova.Updater):
 
     @classmethod
     def review(cls):
-        for v in WebSocket.SSL.itervalues():
+        for v in Nova.SSL.itervalues():
             cls.log("Imported SSL from '{}'...".format(v))
         for k in Events.EVENTS.iterkeys():
             cls.log("Imported javascript event '{}'...".format(k))
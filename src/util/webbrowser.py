@@ -19,13 +19,19 @@ Web browser to create and reproduce sample scripts.
 from tools import save_html
 from capabilities import Capabilities
 
-from core.schema import Schema
+from core.schema import Schema, Record
 from core.browser import Browser
+from core.javascript import JS
 
 
 class WebBrowser(Browser):
 
     JAVASCRIPT_INJECTION = r""
+    SETTERS = None
+    COALESCE, MAX_BATCH = 0, 64
+    STATE = Browser.STATE + ("batch", "batches", "failed_events")
+
+    batch, batches, failed_events = None, 0, 0
 
     @classmethod
     def set_logger(cls, logger):
@@ -35,17 +41,107 @@ class WebBrowser(Browser):
     def set_script(cls, script):
         cls.JAVASCRIPT_INJECTION = script
 
+    @classmethod
+    def set_events(cls, events):
+        cls.SETTERS = JS.setters(events)
+
+    @classmethod
+    def set_coalescing(cls, window=None):
+        if window is not None:
+            cls.COALESCE = float(window) / 1000
+            if cls.COALESCE < 0:
+                raise ValueError("Unexpected coalescing window: must be positive")
+        return cls
+
     def inject_nova(self):
         self.run_js(self.JAVASCRIPT_INJECTION)
 
+    def install_setters(self):
+        if self.SETTERS is None:
+            return 0
+        return self.run_js(self.SETTERS)
+
     def run_js(self, js):
         return self.browser.execute_script(js)
 
     def run_action(self, event):
-        if not isinstance(event, Schema):
+        if not isinstance(event, (Schema, Record)):
             raise TypeError("Event not implemented with schema")
+        return self.dispatch(self.prepare(event))
+
+    def prepare(self, event):
         name = event.__class__.__name__
-        return self.action(name, event._setter, event.timestamp)
+        call = self.call(event)
+        if call is not None:
+            return (name, JS.CALL, event.timestamp) + call
+        return name, event._setter, event.timestamp
+
+    def dispatch(self, prepared):
+        if not self.COALESCE:
+            return self.action(*prepared)
+        deadline = self.deadline(max(prepared[2] / 1000., 0)) or 0
+        results = None
+        if self.batch and (deadline - self.batch[0][1] > self.COALESCE
+                           or len(self.batch) >= self.MAX_BATCH):
+            results = self.flush()
+        if self.batch is None:
+            self.batch = []
+        self.batch.append((prepared, deadline))
+        return results
+
+    def flush(self):
+        batch, self.batch = self.batch, []
+        if not batch:
+            return []
+        lateness = self.wait(None if self.asap else batch[0][1])
+        calls = []
+        for prepared, _ in batch:
+            name, script, timestamp = prepared[:3]
+            self.before_action(name, script, max(timestamp / 1000., 0))
+            calls.append(list(prepared[3:]) if len(prepared) > 3 else [None, script])
+        replies = self.execute(JS.BATCH, calls)
+        results = []
+        for (prepared, _), (ok, reply) in zip(batch, replies):
+            name, script, timestamp = prepared[:3]
+            if not ok:
+                self.failed_events += 1
+                self.log("Event {} failed: {}".format(name, reply))
+            self.after_action(name, script, max(timestamp / 1000., 0), lateness)
+            results.append((ok, reply))
+        self.calltime = max(batch[-1][0][2] / 1000., 0)
+        self.batches += 1
+        return results
+
+    def call(self, event):
+        if self.SETTERS is None or not getattr(event, "_function", None):
+            return None
+        try:
+            return event._name, event.arguments()
+        except ValueError:
+            return None
+
+    def cue(self, event, at):
+        call = self.call(event)
+        if call is None:
+            return [int(at * 1000), None, event._setter]
+        return [int(at * 1000), call[0], call[1]]
+
+    def play(self, chunk, now, drain=False):
+        args = chunk, int(now * 1000), drain, self.LATENESS_TOLERANCE * 1000
+        reply = self.browser.execute_async_script(JS.PLAYER, *args)
+        if reply == JS.MISSING:
+            self.log("Reinstalling setters after navigation...")
+            self.install_setters()
+            reply = self.browser.execute_async_script(JS.PLAYER, *args)
+        return reply
+
+    def execute(self, script, *args):
+        reply = super(WebBrowser, self).execute(script, *args)
+        if args and reply == JS.MISSING:
+            self.log("Reinstalling setters after navigation...")
+            self.install_setters()
+            reply = super(WebBrowser, self).execute(script, *args)
+        return reply
 
     def setup(self):
         # NOTE: Apparently, none of Chrome & Firefox validate SSL for websocket
@@ -55,6 +151,7 @@ class WebBrowser(Browser):
 
     def on_page_load(self):
         self.inject_nova()
+        self.install_setters()
 
     def save(self):
         file_, dir_ = save_html(self.browser.page_source, self.url, root_dir=self.SAVE_PATH)
@@ -63,5 +160,6 @@ class WebBrowser(Browser):
     def before_action(self, name, event, timestamp):
         self.log("Running event: {}".format(name))
 
-    def after_action(self, name, event, timestamp):
-        self.log("Timelapse (s): {}".format(timestamp))
+    def after_action(self, name, event, timestamp, lateness=0):
+        self.log("Timelapse (s): {} late by (ms): {:.1f}".format(
+            timestamp, lateness * 1000))
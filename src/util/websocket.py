@@ -16,7 +16,8 @@
 Local server to create and reproduce sample scripts.
 """
 
-from tools import parse_url, create_nvs_file, update_nvs_session
+from tools import parse_url, create_nvs_file, update_nvs_session, open_nvs_session
+from compression import Compression
 
 from core.server import Server
 
@@ -24,15 +25,21 @@ from core.server import Server
 class WebSocket(Server.WebSocketServer):
 
     SCRIPTS_PATH = r"dump"
+    COMPRESS = False
 
     connect_hooks, disconnect_hooks = [], []
     session, paths = None, None
+    stream, lines = None, 0
 
     @classmethod
     def set_scripts_path(cls, path):
         if isinstance(path, (str, unicode)) and len(path) > 0:
             cls.SCRIPTS_PATH = path
 
+    @classmethod
+    def set_compression(cls, compress):
+        cls.COMPRESS = bool(compress)
+
     @classmethod
     def set_ssl_path(cls, certfile, keyfile):
         if isinstance(certfile, (str, unicode)) and len(certfile) > 0:
@@ -56,12 +63,23 @@ class WebSocket(Server.WebSocketServer):
         return True
 
     def on_connect_callback(self):
-        self.session = create_nvs_file(*self.paths, root_dir=self.SCRIPTS_PATH)
+        self.session = create_nvs_file(*self.paths, root_dir=self.SCRIPTS_PATH,
+                                       compress=self.COMPRESS)
+        if self.COMPRESS:
+            self.stream, self.lines = open_nvs_session(*self.session), 0
         self.loop_hooks(self.connect_hooks)
 
     def on_disconnect_callback(self):
-        self.session, self.paths = None, None
+        if self.stream is not None:
+            self.stream.close()
+        self.session, self.paths, self.stream = None, None, None
         self.loop_hooks(self.disconnect_hooks)
 
     def on_message_callback(self):
-        update_nvs_session(self.message, *self.session)
+        # NOTE: the recorder batches events as one multi-line frame
+        update_nvs_session(self.message, *self.session, stream=self.stream)
+        if self.stream is not None:
+            self.lines += self.message.count("\n") + 1
+            if self.lines >= Compression.FLUSH_LINES:
+                self.stream.flush()
+                self.lines = 0
@@ -21,15 +21,20 @@ from __future__ import print_function
 from time import sleep
 
 from nova import Nova
-from tools import nicefy
+from tools import nicefy, parse_position
 from reader import Reader
+from optimizer import Optimizer
 from recorder import Recorder
 from webbrowser import WebBrowser
+from display_pool import DisplayPool
+from capabilities import Capabilities
 from user_agent import detect_engine, detect_browser
 
 from core.events import Events
 from core.schema import Schema
 from core.worker import Worker
+from core.player import Player
+from core.pipeline import Pipeline
 from core.javascript import JS
 
 from libs.ffmpeg import ffmpeg
@@ -37,27 +42,44 @@ from libs.ffmpeg import ffmpeg
 
 class WorkMode(Nova.Mode):
 
+    NATIVE = "native"
+
     display = Nova.Display.SystemScreen
 
     url, start_time, user_agent, environment = None, None, None, None
     nvs, browser, events, headless = None, None, None, False
+    pipeline, optimizer = None, None
 
-    record, recorder = None, None
+    record, recorder, pool, displays = None, None, None, None
+    camera = None
 
-    def __init__(self, log, shell, headless=False, record=None):
+    def __init__(self, log, shell, headless=False, record=None, pool=None,
+                 displays=None):
         self.log = log
         self.log.info("Launching Nova in working mode...")
         self.shell = shell
-        if headless:
+        self.pool = pool
+        self.displays = displays
+        if headless == self.NATIVE:
+            self.prepare_native()
+        elif headless:
             self.prepare_headless()
+        else:
+            Capabilities.set_headless(False)
         if record is not None:
             self.prepare_camera()
 
     def prepare_headless(self):
+        Capabilities.set_headless(False)
         self.display = Nova.Display.VirtualScreen
         self.log.info("Notice: running headless in an X virtual framebuffer")
         return self
 
+    def prepare_native(self):
+        Capabilities.set_headless(True)
+        self.log.info("Notice: running headless with the browser native mode")
+        return self
+
     def prepare_camera(self):
         self.record, self.recorder = True, Recorder
         self.log.info("Notice: recording session at {} FPS".format(self.shell.fps))
@@ -75,8 +97,27 @@ class WorkMode(Nova.Mode):
         self.update_environment()
         return self
 
+    def prepare_position(self):
+        start, stop = self.shell.start_at, self.shell.stop_at
+        if start is not None:
+            event, time = parse_position(start)
+            self.nvs.seek(event=event, time=time)
+            self.log.info("Starting scenario at {}".format(start))
+        if stop is not None:
+            event, time = parse_position(stop)
+            self.nvs.until(event=event, time=time)
+            self.log.info("Stopping scenario at {}".format(stop))
+        return self
+
     def prepare_events(self):
-        self.events = {k:v for k, v in Events.builder(Schema)}
+        if self.events is None:
+            self.events = Events.compiled(Schema)
+        return self
+
+    def prepare_optimizer(self):
+        if self.shell.optimize:
+            self.optimizer = Optimizer()
+            self.log.info("Notice: thinning redundant mousemove and scroll events")
         return self
 
     def update_url(self):
@@ -107,7 +148,13 @@ class WorkMode(Nova.Mode):
     def start_browser(self):
         browser = self.find_browser_by_user_agent()
         WebBrowser.set_logger(self.log.info)
-        self.browser = WebBrowser(browser, *self.environment[:2])
+        WebBrowser.set_pace(self.shell.speed, self.shell.max_idle)
+        WebBrowser.set_events(self.events)
+        WebBrowser.set_coalescing(self.shell.coalesce)
+        if self.pool is not None:
+            self.browser = self.pool.acquire(browser, *self.environment[:2])
+        else:
+            self.browser = WebBrowser(browser, *self.environment[:2])
         self.browser.set_script(JS.ON_STARTUP)
         self.browser.open_page(self.url)
         return self
@@ -123,37 +170,153 @@ class WorkMode(Nova.Mode):
     def start_activity(self):
         if self.record:
             self.start_filming()
+        try:
+            if self.shell.in_page:
+                self.play_events()
+            else:
+                self.dispatch_events()
+            self.stop_filming()
+            self.report_timing().report_pipeline().report_optimizer()
+        finally:
+            self.stop_filming()
+            self.release_browser()
+        return self
+
+    def stop_filming(self):
+        if self.camera is not None:
+            self.camera.stop()
+            self.camera = None
+        return self
+
+    def play_events(self):
+        self.log.info("Notice: scheduling events with the in-page player")
+        self.pipeline = Pipeline(self.read_events(), waiting=self.waited)
+        try:
+            Player(self.browser).play(self.pipeline)
+        except Exception as e:
+            self.pipeline.close()
+            self.log.warn("Recover event: {}".format(e))
+        return self
+
+    def dispatch_events(self):
+        self.pipeline = Pipeline(self.read_events(), self.prepare_event,
+                                 waiting=self.waited)
+        for prepared in self.pipeline:
+            if prepared is None:
+                continue
+            try:
+                self.browser.dispatch(prepared)
+            except Exception as e:
+                self.log.warn("Recover event: {}".format(e))
+        try:
+            self.browser.flush()
+        except Exception as e:
+            self.log.warn("Recover event: {}".format(e))
+        return self
+
+    def release_browser(self):
+        if self.browser is None:
+            return self
+        if self.pool is not None:
+            self.pool.release(self.browser)
+        elif not self.browser.closed:
+            self.browser.close_browser()
+        self.browser = None
+        return self
+
+    def report_timing(self):
+        if self.browser.batches:
+            self.log.info("Replay batches: {} browser calls, {} failed events"
+                          .format(self.browser.batches, self.browser.failed_events))
+        late = self.browser.late_events
+        if late == 0:
+            self.log.info("Replay timing: all events on schedule")
+            return self
+        self.log.info("Replay timing: {} late events, avg {:.1f} ms, max {:.1f} ms"
+                      .format(late, self.browser.lateness * 1000 / late,
+                              self.browser.max_lateness * 1000))
+        return self
+
+    def report_optimizer(self):
+        if self.optimizer is not None:
+            self.log.info("Optimizer: removed {} of {} events".format(
+                self.optimizer.removed, self.optimizer.read))
+        return self
+
+    def report_pipeline(self):
+        pipeline = self.pipeline
+        self.log.info("Replay pipeline: {} events, queue depth avg {:.1f} max {}"
+                      .format(pipeline.items, pipeline.average_depth(),
+                              pipeline.max_depth))
+        self.log.info("Replay pipeline: browser busy {:.3f}s, scheduled wait {:.3f}s"
+                      .format(pipeline.busy_time(), pipeline.waited))
+        self.log.info("Replay pipeline: decoder stalls {} ({:.3f}s), "
+                      "browser backpressure {} ({:.3f}s), bottleneck: {}"
+                      .format(pipeline.stalls, pipeline.stall_time,
+                              pipeline.blocks, pipeline.backpressure(),
+                              pipeline.bottleneck()))
+        return self
+
+    def waited(self):
+        return self.browser.waited if self.browser is not None else 0
+
+    def prepare_event(self, event):
+        try:
+            return self.browser.prepare(event)
+        except Exception as e:
+            self.log.warn("Recover event: {}".format(e))
+        return None
+
+    def read_actions(self):
         while not self.nvs.ended():
             action = self.nvs.read()
             if action is None:
                 break
+            if isinstance(action, tuple):
+                yield action
+                continue
+            try:
+                yield Schema.parse(action)
+            except Exception as e:
+                self.log.warn("Recover event: {}".format(e))
+
+    def read_events(self):
+        resume = self.shell.start_at is not None
+        actions = self.read_actions()
+        if self.optimizer is not None:
+            actions = self.optimizer.filter(actions)
+        for action in actions:
             try:
                 event = self.read_event(action)
-                self.browser.run_action(event)
             except Exception as e:
                 self.log.warn("Recover event: {}".format(e))
-        if self.record:
-            self.camera.stop()
-        self.browser.close_browser()
-        return self
+                continue
+            if resume and event.timestamp is not None:
+                self.browser.calltime = event.timestamp / 1000.
+                resume = False
+            yield event
 
     def read_event(self, action):
-        schema = Schema.developer(action)
-        event = schema.pop("event", None)
-        if event is None:
-            raise ValueError("Outdated or invalid nvs: not able to decode event")
-        event_class = self.events.get(event)
+        if not isinstance(action, tuple):
+            action = Schema.parse(action)
+        event_class = self.events.get(action[0])
         if event_class is None or not callable(event_class):
             raise ValueError("Outdated or invalid nvs: not able to decode event")
-        return event_class(schema)
+        return event_class(action)
 
     def run(self):
-        self.prepare_nvs().prepare_headers().prepare_events()
+        self.prepare_nvs().prepare_headers().prepare_position()
+        self.prepare_events().prepare_optimizer()
         params = dict(zip(Nova.Display.PARAMS, self.environment[2:4]))
-        with self.display(**params) as screen:
+        with self.lease_display(params) as screen:
             self.start_browser().start_activity()
         self.log.info("Task done")
 
+    def lease_display(self, params):
+        if self.displays is not None and self.display is Nova.Display.VirtualScreen:
+            return self.displays.lease(**params)
+        return self.display(**params)
+
     def clean(self, callback=None, args=()):
         if callable(callback) and isinstance(args, tuple):
             try:
@@ -168,9 +331,12 @@ class WorkMode(Nova.Mode):
 
 def work_mode(log, shell):
     Nova.work_mode(shell)
+    displays = None
+    if shell.headless and shell.headless != WorkMode.NATIVE:
+        displays = DisplayPool(max_displays=1, log=log.info)
     try:
         opts = {}
-        mode = WorkMode(log, shell, shell.headless, shell.record)
+        mode = WorkMode(log, shell, shell.headless, shell.record, displays=displays)
         if shell.record:
             opts.update({
                 "callback": ffmpeg,
@@ -180,3 +346,6 @@ def work_mode(log, shell):
         mode.clean(**opts)
     except Exception as e:
         Nova.error(e)
+    finally:
+        if displays is not None:
+            displays.close()
@@ -0,0 +1,108 @@
+# Copyright 2017 Alexandru Catrina
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Daemon jobs must not leak class level settings into later jobs.
+
+Usage: python -m unittest discover tests
+"""
+
+from os import path, remove
+from sys import path as sys_path, argv
+from tempfile import mkstemp
+from unittest import TestCase, main
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys_path.insert(0, path.join(ROOT, "src"))
+sys_path.insert(0, path.join(ROOT, "src", "util"))
+
+from util.shell import Shell
+from util.daemon_mode import DaemonMode
+from util.work_mode import WorkMode
+from util.webbrowser import WebBrowser
+from util.capabilities import Capabilities
+
+
+class Log(object):
+
+    def info(self, message, *args):
+        pass
+
+    warn = debug = info
+
+
+class Session(object):
+
+    closed = False
+
+    def set_script(self, script):
+        pass
+
+    def open_page(self, url):
+        pass
+
+
+class Pool(object):
+
+    def acquire(self, browser, width, height):
+        return Session()
+
+    def release(self, session):
+        pass
+
+    def close(self):
+        pass
+
+
+class DaemonModeTest(TestCase):
+
+    def setUp(self):
+        fd, self.task = mkstemp(suffix=".nvs")
+        with open(self.task, "w") as nvs:
+            nvs.write("about:blank\n1500000000000\n")
+            nvs.write("Mozilla/5.0 (X11; Linux x86_64; rv:55.0) Gecko/20100101 Firefox/55.0\n")
+            nvs.write("1366,768,1920,1080,24,24,1\n")
+        argv[1:] = ["-d", "-S"]
+        shell, _ = Shell.read_args()
+        self.daemon = DaemonMode(Log(), shell)
+        self.daemon.pool = Pool()
+        self.paces = []
+        self.start_activity = WorkMode.__dict__["start_activity"]
+        WorkMode.start_activity = lambda mode: self.paces.append(
+            (WebBrowser.asap, WebBrowser.speed, WebBrowser.COALESCE,
+             Capabilities.native))
+
+    def tearDown(self):
+        WorkMode.start_activity = self.start_activity
+        self.daemon.restore()
+        remove(self.task)
+
+    def replay(self, **args):
+        args.update(task=self.task)
+        self.daemon.replay(Log(), self.daemon.options(args))
+
+    def test_settings_do_not_leak_between_jobs(self):
+        self.replay(speed="max", coalesce=20, headless="native")
+        self.replay()
+        self.assertEqual(self.paces[0], (True, 1., .02, True))
+        self.assertEqual(self.paces[1], (False, 1., 0, False))
+
+    def test_numeric_speed_after_max(self):
+        self.replay(speed="max")
+        self.replay(speed=2)
+        self.assertEqual(self.paces[1][:2], (False, 2.))
+
+
+if __name__ == "__main__":
+    main()